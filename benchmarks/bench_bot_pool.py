@@ -0,0 +1,71 @@
+import time
+
+from common import percentile
+
+from enums.worker_mode import WorkerMode
+from session import Session
+from utils.bot_pool import BotWorkerPool
+from utils.bot_scheduler import BotScheduler
+
+
+class SlowBot:
+    # Stands in for a planner or network whose inference takes a fixed time per call.
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def get_action(self, obs):
+        time.sleep(self.seconds)
+        return 4
+
+
+def run(mode, sessions: int, apm: int, inference: float, duration: float) -> dict:
+    drift, actions = [], []
+
+    scheduler = BotScheduler()
+    scheduler.on_drift(lambda session, due, fired: drift.append((fired - due) * 1000))
+
+    pool = None
+    if mode is None:
+        # Inference inline on the scheduler thread, as before the pool existed.
+        scheduler.on_decision(lambda session: actions.append(session.bot.get_action(obs=None)))
+    else:
+        pool = BotWorkerPool(workers=4, mode=mode)
+        pool.on_action(lambda session, action: actions.append(action))
+        pool.start()
+        scheduler.on_decision(lambda session: pool.submit(session, None))
+
+    members = []
+    for i in range(sessions):
+        session = Session(f'bench-{i}', 'localhost')
+        session.config = {'bot_apm': apm}
+        session.bot = SlowBot(inference)
+        members.append(session)
+
+    scheduler.start()
+    for session in members:
+        scheduler.schedule(session)
+    time.sleep(duration)
+    scheduler.stop()
+
+    result = {'actions': len(actions) / duration, 'drift_p95': percentile(drift, 95), 'dropped': 0, 'inference_p50': 0.0}
+    if pool is not None:
+        pool.stop()
+        stats = pool.stats()
+        result['dropped'] = stats['dropped']
+        result['inference_p50'] = stats['inference'].get('p50', 0.0)
+    return result
+
+
+def main(sessions: int = 8, apm: int = 240, inference: float = 0.05, duration: float = 5.0):
+    print(f'{sessions} sessions at {apm} APM, {inference * 1000:.0f} ms per inference '
+          f'(demand {sessions * apm / 60:.0f} actions/s)')
+    print(f'{"inference":<12}{"actions/s":>11}{"drift p95 ms":>14}{"superseded":>12}{"infer p50 ms":>14}')
+    for name, mode in (('inline', None), ('threads', WorkerMode.Thread), ('processes', WorkerMode.Process)):
+        result = run(mode, sessions, apm, inference, duration)
+        print(f'{name:<12}{result["actions"]:>11.1f}{result["drift_p95"]:>14.1f}'
+              f'{result["dropped"]:>12}{result["inference_p50"]:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import random
+import time
+
+from common import percentile
+
+from session import Session
+from utils.bot_scheduler import BotScheduler
+
+
+def jittery_frames(duration: float, fps: int, stall_chance: float, on_frame):
+    # Frame arrivals with network jitter and occasional stalls, as seen by the server.
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        time.sleep(random.uniform(0.5, 1.5) / fps)
+        if random.random() < stall_chance:
+            time.sleep(random.uniform(0.2, 0.6))
+        on_frame()
+
+
+def frame_driven(session: Session, duration: float, fps: int, stall_chance: float) -> list:
+    # The former policy: decide on a frame once action_time_gap has passed since the last decision.
+    fired = []
+
+    def on_frame():
+        now = time.perf_counter()
+        if not fired or now - fired[-1] > session.action_time_gap:
+            fired.append(now)
+
+    jittery_frames(duration, fps, stall_chance, on_frame)
+    return fired
+
+
+def scheduled(session: Session, duration: float, fps: int, stall_chance: float) -> list:
+    fired = []
+
+    scheduler = BotScheduler()
+    scheduler.on_decision(lambda _: fired.append(time.perf_counter()))
+    scheduler.start()
+    scheduler.schedule(session)
+
+    jittery_frames(duration, fps, stall_chance, lambda: None)
+
+    scheduler.stop()
+    return fired
+
+
+def main(apm: int = 600, fps: int = 30, duration: float = 10.0, stall_chance: float = 0.02):
+    session = Session('bench', 'localhost')
+    session.config = {'bot_apm': apm}
+    target = session.action_time_gap * 1000
+
+    print(f'target interval {target:.0f} ms ({apm} APM), {fps} fps with {stall_chance:.0%} stalls')
+    print(f'{"policy":<14}{"APM":>8}{"|err| p50 ms":>14}{"|err| p95 ms":>14}{"|err| max ms":>14}')
+    for name, policy in (('frame-driven', frame_driven), ('scheduled', scheduled)):
+        random.seed(0)
+        fired = policy(session, duration, fps, stall_chance)
+        errors = [abs((b - a) * 1000 - target) for a, b in zip(fired, fired[1:])]
+        print(f'{name:<14}{len(fired) / duration * 60:>8.0f}{percentile(errors, 50):>14.2f}'
+              f'{percentile(errors, 95):>14.2f}{max(errors):>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+from common import sample_frames, measure
+
+from utils.frame_codec import encode_frame, decode_frame, CODEC_NAMES
+
+
+def main(count: int = 30):
+    frames = sample_frames(count)
+
+    print(f'{"codec":<8}{"bytes/frame":>14}{"ratio":>9}{"encode ms":>12}{"decode ms":>12}')
+    raw_size = frames[0].nbytes
+    for codec, name in CODEC_NAMES.items():
+        encoded = [encode_frame(frame, codec) for frame in frames]
+        size = sum(len(data) for data in encoded) / len(encoded)
+
+        encode_ms = sum(measure(lambda: encode_frame(frame, codec), 3) for frame in frames) / len(frames)
+        decode_ms = sum(measure(lambda: decode_frame(data, codec, frames[0].shape), 3) for data in encoded) / len(encoded)
+
+        print(f'{name:<8}{size:>14.0f}{raw_size / size:>9.1f}{encode_ms:>12.2f}{decode_ms:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
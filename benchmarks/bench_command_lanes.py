@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+from common import percentile
+
+import grpc
+import experimentservice_pb2 as pb
+import experimentservice_pb2_grpc as rpc
+
+import session as session_module
+from enums.commands import Command
+from experiment_service import ExperimentServer
+from utils.command_queue import PriorityCommandQueue, lane_of
+from utils.grpc_options import SESSION_TOKEN_KEY
+
+
+class FifoCommandQueue(PriorityCommandQueue):
+    # The single FIFO every command used to share: no lanes, no merging, nothing dropped at an abort.
+
+    def _push(self, state):
+        self._lanes[lane_of(state.command)].append((state, time.perf_counter()))
+
+    def _pop(self):
+        lanes = [queue for queue in self._lanes.values() if queue]
+        return min(lanes, key=lambda queue: queue[0][1]).popleft()[0]
+
+    def coalesce(self, state) -> bool:
+        return False
+
+
+async def hog_loop(busy: float):
+    # Other sessions' streams on the same event loop; every turn of the loop costs this much.
+    while True:
+        time.sleep(busy)
+        await asyncio.sleep(0)
+
+
+async def run(queue_class, inputs_per_second: int, busy: float, duration: float, port: int = 11996) -> dict:
+    session_module.PriorityCommandQueue = queue_class
+    sessions = []
+    connected = threading.Event()
+
+    def on_client_connected(session):
+        sessions.append(session)
+        connected.set()
+
+    server_manager = ExperimentServer()
+    server_manager.on_client_connected(on_client_connected)
+    server = grpc.aio.server()
+    rpc.add_ExperimentServiceServicer_to_server(server_manager, server)
+    server.add_insecure_port('localhost:' + str(port))
+    await server.start()
+
+    channel = grpc.aio.insecure_channel('localhost:' + str(port))
+    stream = rpc.ExperimentServiceStub(channel).ServerSignal(pb.Empty(), metadata=((SESSION_TOKEN_KEY, 'lanes'),))
+    aborts = []
+    received = [0]
+
+    async def consume():
+        async for state in stream:
+            received[0] += 1
+            if state.command == Command.AbortGame:
+                aborts.append((time.time() - state.timestamp) * 1000)
+
+    consumer = asyncio.ensure_future(consume())
+    await asyncio.get_running_loop().run_in_executor(None, connected.wait)
+    hog = asyncio.ensure_future(hog_loop(busy))
+
+    def produce():
+        # Bot key inputs at a fixed rate, with an abort every 100 ms in between.
+        end = time.perf_counter() + duration
+        next_input = time.perf_counter()
+        count = 0
+        while time.perf_counter() < end:
+            state = pb.State(command=Command.KeyInput)
+            state.key_input.action = count % 6
+            sessions[0].control(state)
+            count += 1
+            if count % max(inputs_per_second // 10, 1) == 0:
+                sessions[0].control(pb.State(command=Command.AbortGame))
+
+            next_input += 1 / inputs_per_second
+            time.sleep(max(next_input - time.perf_counter(), 0))
+
+    await asyncio.get_running_loop().run_in_executor(None, produce)
+    stats = sessions[0].state_queue.stats()
+
+    hog.cancel()
+    consumer.cancel()
+    stream.cancel()
+    server_manager.stop()
+    await server.stop(grace=None)
+    await channel.close()
+    session_module.PriorityCommandQueue = PriorityCommandQueue
+
+    return {
+        'abort_p50': percentile(aborts, 50),
+        'abort_p95': percentile(aborts, 95),
+        'aborts': len(aborts),
+        'received': received[0],
+        'coalesced': stats['coalesced'],
+        'backlog': stats['control']['depth'] + stats['data']['depth'],
+    }
+
+
+def main(inputs_per_second: int = 500, busy: float = 0.002, duration: float = 3.0):
+    print(f'{inputs_per_second} key inputs/s on a server loop that is busy for {busy * 1000:.0f} ms per turn')
+    print(f'{"queue":<10}{"abort p50 ms":>14}{"abort p95 ms":>14}{"aborts":>8}{"received":>10}{"merged":>8}'
+          f'{"backlog":>9}')
+    for name, queue_class in (('fifo', FifoCommandQueue), ('lanes', PriorityCommandQueue)):
+        r = asyncio.run(run(queue_class, inputs_per_second, busy, duration))
+        print(f'{name:<10}{r["abort_p50"]:>14.1f}{r["abort_p95"]:>14.1f}{r["aborts"]:>8}{r["received"]:>10}'
+              f'{r["coalesced"]:>8}{r["backlog"]:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+from common import sample_frames, measure
+
+from enums.codec import Codec
+from utils.frame_codec import CODEC_NAMES
+from utils.frame_delta import DeltaEncoder
+
+
+def main(count: int = 120):
+    frames = sample_frames(count)
+
+    print(f'{"codec":<8}{"keyframe bytes":>16}{"delta bytes":>14}{"ratio":>9}{"encode ms":>12}')
+    for codec in (Codec.Raw, Codec.Zlib, Codec.JPEG):
+        encoder = DeltaEncoder(keyframe_interval=count)
+        keyframe_size, delta_sizes = 0, []
+
+        for frame in frames:
+            gs = encoder.encode(frame, codec)
+            encoder.acknowledge(gs.frame_id)
+            if gs.keyframe:
+                keyframe_size = gs.ByteSize()
+            else:
+                delta_sizes.append(gs.ByteSize())
+
+        def encode_one():
+            gs = encoder.encode(frames[-1], codec)
+            encoder.acknowledge(gs.frame_id)
+
+        delta_size = sum(delta_sizes) / max(len(delta_sizes), 1)
+        print(f'{CODEC_NAMES[codec]:<8}{keyframe_size:>16}{delta_size:>14.0f}'
+              f'{keyframe_size / max(delta_size, 1):>9.1f}{measure(encode_one, 20):>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+from common import sample_frames, measure
+
+import numpy as np
+import pygame as pg
+
+from utils.display import Display
+
+
+def make_surface(display, image):
+    # What every display loop used to do: flip and rotate copies, then a new Surface per frame.
+    display.screen.blit(pg.surfarray.make_surface(np.rot90(np.flip(image[..., ::-1], 1))), (0, 0))
+
+
+def blit_array(display, image):
+    # In place into the window surface, but reading the image transposed and channel-reversed.
+    pg.surfarray.blit_array(display.screen, image.swapaxes(0, 1)[..., ::-1])
+
+
+def persistent(display, image):
+    display.upload(image)
+
+
+def main(count: int = 30, repeat: int = 20):
+    frames = sample_frames(count)
+    display = Display('bench_display')
+
+    reference = None
+    print(f'{"upload":<14}{"ms/frame":>10}')
+    for name, fn in (('make_surface', make_surface), ('blit_array', blit_array), ('persistent', persistent)):
+        ms = sum(measure(lambda: fn(display, frame), repeat) for frame in frames) / len(frames)
+        print(f'{name:<14}{ms:>10.2f}')
+
+        # Every way must put the same pixels on screen.
+        fn(display, frames[-1])
+        shown = pg.surfarray.array3d(display.screen)
+        if reference is None:
+            reference = shown
+        assert np.array_equal(shown, reference), name
+
+    pg.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+from common import sample_frames, percentile
+
+import grpc
+import numpy as np
+import experimentservice_pb2 as pb
+import experimentservice_pb2_grpc as rpc
+
+from enums.codec import Codec
+from enums.commands import Command
+from experiment_service import ExperimentServer
+from utils.frame_delta import DeltaEncoder, DeltaDecoder
+from utils.frame_ring import FrameRing
+from utils.frame_stream import FrameStream
+from utils.grpc_options import SERVER_OPTIONS, CHANNEL_OPTIONS
+
+
+async def run(frames: list, codec, duration: float, port: int = 11997) -> dict:
+    # A client and server on one host, streaming full keyframes as fast as the ack window allows.
+    ring = FrameRing.create('turingtest-bench', frames[0].shape) if codec is None else None
+    encoder = DeltaEncoder(keyframe_interval=1)
+    sent_at, round_trips, upstream = {}, [], []
+
+    def next_frame(frame_id: int):
+        image = frames[frame_id % len(frames)]
+        if ring is not None:
+            gs = pb.GameSync()
+            gs.shm_name = ring.name
+            gs.shm_sequence = ring.write(image)
+            gs.frame_id = frame_id
+        else:
+            gs = encoder.encode(image, codec, frame_id)
+        upstream.append(gs.ByteSize())
+        sent_at[frame_id] = time.perf_counter()
+        return gs
+
+    def on_client_connected(session):
+        session.frame_decoder = DeltaDecoder(np.zeros(frames[0].shape, dtype=np.uint8))
+
+    def on_game_sync(session, data):
+        # The server attaches by name; the bench process already has the ring, so it reads it directly.
+        if data.shm_name:
+            return ring.read_copy(data.shm_sequence) is not None
+        return session.frame_decoder.apply(data)
+
+    server_manager = ExperimentServer()
+    server_manager.on_client_connected(on_client_connected)
+    server_manager.on_game_sync(on_game_sync)
+
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    rpc.add_ExperimentServiceServicer_to_server(server_manager, server)
+    server.add_insecure_port('localhost:' + str(port))
+    await server.start()
+
+    channel = grpc.aio.insecure_channel('localhost:' + str(port), options=CHANNEL_OPTIONS)
+    stream = FrameStream(next_frame)
+    stream.notify_frame()
+
+    async def listen():
+        try:
+            async for state in rpc.ExperimentServiceStub(channel).GameStream(stream):
+                if state.command == Command.FrameAck:
+                    round_trips.append((time.perf_counter() - sent_at.pop(state.frame_id)) * 1000)
+                    stream.acknowledge(state.frame_id)
+                    stream.notify_frame()
+        except (grpc.RpcError, asyncio.CancelledError):
+            pass
+
+    listener = asyncio.ensure_future(listen())
+    await asyncio.sleep(duration)
+
+    stream.close()
+    await channel.close()
+    await listener
+    server_manager.stop()
+    await server.stop(grace=None)
+    if ring is not None:
+        ring.close()
+
+    return {
+        'fps': len(round_trips) / duration,
+        'bytes': sum(upstream) / max(len(upstream), 1),
+        'rtt_p50': percentile(round_trips, 50),
+        'rtt_p95': percentile(round_trips, 95),
+    }
+
+
+def main(duration: float = 3.0):
+    frames = sample_frames(30)
+
+    print(f'{"transport":<16}{"frames/s":>10}{"gRPC bytes":>12}{"ack p50 ms":>12}{"ack p95 ms":>12}')
+    for name, codec in (('gRPC Raw', Codec.Raw), ('gRPC Zlib', Codec.Zlib), ('gRPC JPEG', Codec.JPEG),
+                        ('shared memory', None)):
+        result = asyncio.run(run(frames, codec, duration))
+        print(f'{name:<16}{result["fps"]:>10.0f}{result["bytes"]:>12.0f}'
+              f'{result["rtt_p50"]:>12.2f}{result["rtt_p95"]:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
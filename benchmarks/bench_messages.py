@@ -0,0 +1,62 @@
+import json
+import time
+
+from common import measure
+
+import experimentservice_pb2 as pb
+
+from enums.commands import Command
+from utils.messages import config_message, config_from_message
+
+
+CONFIG = {'level': 'asymmetric_advantages', 'duration': 120, 'player': 'Bot', 'bot_apm': 80, 'codec': 2,
+          'sync_mode': 'Screen', 'frame_transport': 'Network', 'fps': 30}
+
+
+def _legacy(payload: str) -> pb.State:
+    # Commands used to carry their body as a JSON string. GameState.state is a string field with the same
+    # wire shape as the old payload, so it stands in for it here.
+    state = pb.State(command=Command.KeyInput, timestamp=time.time())
+    state.game_state.state = payload
+    return state
+
+
+def _typed_key_input() -> pb.State:
+    state = pb.State(command=Command.KeyInput, timestamp=time.time())
+    state.key_input.action = 3
+    state.key_input.sequence = 12345
+    return state
+
+
+def _typed_config() -> pb.State:
+    state = pb.State(command=Command.ChangeConfig, timestamp=time.time())
+    state.config.CopyFrom(config_message(CONFIG))
+    return state
+
+
+def _parse(data: bytes, read):
+    return read(pb.State.FromString(data))
+
+
+def main(repeat: int = 20000):
+    cases = [
+        ('KeyInput', 'json', lambda: _legacy(json.dumps({'action': 3, 'sequence': 12345})),
+         lambda state: json.loads(state.game_state.state)['action']),
+        ('KeyInput', 'typed', _typed_key_input,
+         lambda state: state.key_input.action),
+        ('Config', 'json', lambda: _legacy(json.dumps(CONFIG)),
+         lambda state: json.loads(state.game_state.state)),
+        ('Config', 'typed', _typed_config,
+         lambda state: config_from_message(state.config)),
+    ]
+
+    print(f'{"command":<10}{"body":<8}{"bytes":>8}{"build us":>11}{"parse us":>11}')
+    for command, body, build, read in cases:
+        data = build().SerializeToString()
+        build_us = measure(lambda: build().SerializeToString(), repeat) * 1000
+        parse_us = measure(lambda: _parse(data, read), repeat) * 1000
+        print(f'{command:<10}{body:<8}{len(data):>8}{build_us:>11.2f}{parse_us:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
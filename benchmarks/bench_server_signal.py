@@ -0,0 +1,83 @@
+import asyncio
+import random
+import threading
+import time
+
+from common import percentile
+
+import grpc
+import experimentservice_pb2 as pb
+import experimentservice_pb2_grpc as rpc
+
+from enums.commands import Command
+from experiment_service import ExperimentServer
+
+
+class PollingExperimentServer(ExperimentServer):
+    # The ServerSignal implementation that slept 10 ms whenever the queue was empty.
+
+    async def _stream_commands(self, session, queue, context):
+        while not context.done() and not queue.closed:
+            state = queue.get(timeout=0)
+            if state is not None:
+                yield state
+            else:
+                await asyncio.sleep(0.01)
+
+
+async def run(server_manager, count: int, port: int = 11999) -> list:
+    connected = threading.Event()
+    sessions = []
+
+    def on_client_connected(session):
+        sessions.append(session)
+        connected.set()
+
+    server_manager.on_client_connected(on_client_connected)
+
+    server = grpc.aio.server()
+    rpc.add_ExperimentServiceServicer_to_server(server_manager, server)
+    server.add_insecure_port('localhost:' + str(port))
+    await server.start()
+
+    channel = grpc.aio.insecure_channel('localhost:' + str(port))
+    stream = rpc.ExperimentServiceStub(channel).ServerSignal(pb.Empty())
+
+    latencies = []
+
+    async def consume():
+        async for state in stream:
+            latencies.append((time.time() - state.timestamp) * 1000)
+            # Key inputs sent while one still waits are merged into it, so fewer than count arrive.
+            if len(latencies) + sessions[0].state_queue.coalesced >= count:
+                break
+
+    consumer = asyncio.ensure_future(consume())
+    await asyncio.get_running_loop().run_in_executor(None, connected.wait)
+
+    for _ in range(count):
+        # KeyInputs arrive at irregular times, like bot decisions and key presses do.
+        await asyncio.sleep(random.uniform(0.002, 0.02))
+        state = pb.State()
+        state.command = Command.KeyInput
+        state.key_input.action = 0
+        sessions[0].control(state)
+
+    await consumer
+    stream.cancel()
+    server_manager.stop()
+    await server.stop(grace=None)
+    await channel.close()
+    return latencies
+
+
+def main(count: int = 300):
+    print(f'{"ServerSignal":<14}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"max ms":>10}')
+    for name, server_manager in (('polling', PollingExperimentServer()), ('blocking', ExperimentServer())):
+        latencies = asyncio.run(run(server_manager, count))
+        print(f'{name:<14}{percentile(latencies, 50):>10.2f}{percentile(latencies, 95):>10.2f}'
+              f'{percentile(latencies, 99):>10.2f}{max(latencies):>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+from common import sample_frames, percentile
+from load_generator import VirtualClient
+
+import grpc
+import numpy as np
+import experimentservice_pb2_grpc as rpc
+
+from experiment_service import ExperimentServer
+from utils.frame_delta import DeltaDecoder
+from utils.grpc_options import SERVER_OPTIONS
+
+
+async def run(count: int, frames: list, fps: int, duration: float, port: int = 11998) -> dict:
+    applied = {}
+    lock = threading.Lock()
+
+    def on_client_connected(session):
+        session.frame_decoder = DeltaDecoder(np.zeros((600, 800, 3), dtype=np.uint8))
+
+    def on_game_sync(session, data):
+        ok = session.frame_decoder.apply(data)
+        with lock:
+            applied[session.session_id] = applied.get(session.session_id, 0) + int(ok)
+        return ok
+
+    server_manager = ExperimentServer()
+    server_manager.on_client_connected(on_client_connected)
+    server_manager.on_game_sync(on_game_sync)
+
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    rpc.add_ExperimentServiceServicer_to_server(server_manager, server)
+    server.add_insecure_port('localhost:' + str(port))
+    await server.start()
+
+    # Clients share the server's event loop here, the way they share the host in a lab.
+    clients = [VirtualClient('localhost:' + str(port), f'virtual-{i}', frames, fps) for i in range(count)]
+    await asyncio.gather(*(client.run(duration) for client in clients))
+
+    server_manager.stop()
+    await server.stop(grace=None)
+
+    per_session = [applied.get(client.token, 0) / duration for client in clients]
+    round_trips = [rtt for client in clients for rtt in client.round_trips]
+    return {
+        'fps': sum(per_session),
+        'min_fps': min(per_session),
+        'rtt_p50': percentile(round_trips, 50),
+        'rtt_p95': percentile(round_trips, 95),
+        'failed': sum(client.failed for client in clients),
+    }
+
+
+def main(fps: int = 30, duration: float = 5.0):
+    frames = sample_frames(60)
+
+    print(f'{"sessions":<10}{"frames/s":>10}{"min fps":>10}{"ack p50 ms":>12}{"ack p95 ms":>12}{"failed":>8}')
+    for count in (1, 4, 8, 16, 32, 64):
+        result = asyncio.run(run(count, frames, fps, duration))
+        print(f'{count:<10}{result["fps"]:>10.0f}{result["min_fps"]:>10.1f}'
+              f'{result["rtt_p50"]:>12.2f}{result["rtt_p95"]:>12.2f}{result["failed"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
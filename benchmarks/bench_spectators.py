@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+from common import sample_frames, percentile
+from load_generator import VirtualClient
+
+import grpc
+import numpy as np
+import experimentservice_pb2 as pb
+import experimentservice_pb2_grpc as rpc
+
+from experiment_service import ExperimentServer
+from utils.broadcast import keyframe_message
+from utils.frame_delta import DeltaDecoder
+from utils.grpc_options import SERVER_OPTIONS
+
+
+async def spectate(address: str, session_id: str, delay: float, received: list):
+    async with grpc.aio.insecure_channel(address) as channel:
+        try:
+            async for _ in rpc.ExperimentServiceStub(channel).Spectate(pb.SpectateRequest(session_id=session_id)):
+                received.append(time.perf_counter())
+                # A spectator on a slow link or machine takes this long per frame.
+                await asyncio.sleep(delay)
+        except (grpc.RpcError, asyncio.CancelledError):
+            pass
+
+
+async def run(spectators: int, frames: list, fps: int, duration: float, port: int = 11997) -> dict:
+    def on_client_connected(session):
+        session.frame_decoder = DeltaDecoder(np.zeros((600, 800, 3), dtype=np.uint8))
+
+    def on_game_sync(session, data):
+        if not session.frame_decoder.apply(data):
+            return False
+        session.spectators.publish(lambda: keyframe_message(session.frame_decoder.screen, data.frame_id,
+                                                            data.timestamp))
+        return True
+
+    server_manager = ExperimentServer()
+    server_manager.on_client_connected(on_client_connected)
+    server_manager.on_game_sync(on_game_sync)
+
+    server = grpc.aio.server(options=SERVER_OPTIONS)
+    rpc.add_ExperimentServiceServicer_to_server(server_manager, server)
+    server.add_insecure_port('localhost:' + str(port))
+    await server.start()
+
+    address = 'localhost:' + str(port)
+    client = VirtualClient(address, 'participant', frames, fps)
+    participant = asyncio.ensure_future(client.run(duration))
+    while server_manager.get_session('participant') is None:
+        await asyncio.sleep(0.01)
+
+    # All but one spectator keep up; the last one takes half a second per frame.
+    received = [[] for _ in range(spectators)]
+    delays = [0.0] * (spectators - 1) + [0.5] if spectators else []
+    viewers = [asyncio.ensure_future(spectate(address, 'participant', delay, frames_received))
+               for delay, frames_received in zip(delays, received)]
+
+    await participant
+    for viewer in viewers:
+        viewer.cancel()
+    await asyncio.gather(*viewers)
+
+    server_manager.stop()
+    await server.stop(grace=None)
+
+    fast = [len(r) / duration for r in received[:-1]]
+    return {
+        'fps': client.acked / duration,
+        'rtt_p95': percentile(client.round_trips, 95),
+        'spectator_fps': sum(fast) / len(fast) if fast else 0.0,
+        'slow_fps': len(received[-1]) / duration if received else 0.0,
+    }
+
+
+def main(fps: int = 30, duration: float = 5.0):
+    frames = sample_frames(60)
+
+    print(f'{"spectators":<12}{"participant fps":>16}{"ack p95 ms":>12}{"spectator fps":>15}{"slow fps":>10}')
+    for spectators in (0, 2, 5, 17):
+        r = asyncio.run(run(spectators, frames, fps, duration))
+        print(f'{spectators:<12}{r["fps"]:>16.1f}{r["rtt_p95"]:>12.2f}{r["spectator_fps"]:>15.1f}{r["slow_fps"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
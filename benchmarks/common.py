@@ -0,0 +1,36 @@
+import os
+import sys
+import random
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+
+def sample_frames(count: int, level: str = 'asymmetric_advantages', seed: int = 0) -> list:
+    # Renders real Overcooked frames at the resolution the client streams (800x600, BGR).
+    from overcooked_ai_py.env import OverCookedEnv
+
+    random.seed(seed)
+    env = OverCookedEnv(scenario=level)
+    env.reset()
+
+    frames = []
+    for _ in range(count):
+        env.step(action=[random.randint(0, 5), random.randint(0, 5)])
+        frames.append(env.render(size=(800, 600)))
+    return frames
+
+
+def measure(fn, repeat: int) -> float:
+    # Mean wall time of fn() in milliseconds.
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def percentile(values, q) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
@@ -0,0 +1,214 @@
+from concurrent import futures
+import argparse
+import asyncio
+import os
+import time
+
+from common import percentile
+
+import grpc
+import numpy as np
+import experimentservice_pb2 as pb
+import experimentservice_pb2_grpc as rpc
+
+from enums.codec import Codec
+from enums.commands import Command
+from utils.frame_delta import DeltaEncoder
+from utils.frame_producer import DEFAULT_FPS
+from utils.frame_stream import FrameStream
+from utils.grpc_options import CHANNEL_OPTIONS, SESSION_TOKEN_KEY
+from utils.latency import ClockOffset
+from utils.messages import config_from_message
+
+
+def synthetic_frames(count: int = 60, seed: int = 0) -> list:
+    # A static tiled floor with a few boxes moving over it, so deltas look like a real game's.
+    rng = np.random.default_rng(seed)
+    floor = np.repeat(np.repeat(rng.integers(0, 255, (15, 20, 3), dtype=np.uint8), 40, axis=0), 40, axis=1)
+    boxes = rng.integers(0, (20, 15), (4, 2))
+
+    frames = []
+    for i in range(count):
+        frame = floor.copy()
+        for n, (x, y) in enumerate(boxes):
+            x = (x + i * (n + 1) // 4) % 20
+            frame[y * 40:(y + 1) * 40, x * 40:(x + 1) * 40] = (0, 0, 255 - n * 40)
+        frames.append(frame)
+    return frames
+
+
+class VirtualClient:
+    # A participant without GUI: streams frames at the configured rate over GameStream and answers commands.
+
+    def __init__(self, address: str, token: str, frames: list, fps: int = DEFAULT_FPS, codec: int = Codec.Zlib):
+        self.address = address
+        self.token = token
+        self.frames = frames
+        self.fps = fps
+        self.codec = codec
+
+        self.encoder = DeltaEncoder()
+        self.stream = FrameStream(self._next_frame)
+        self.stream.on_frames_lost(self.encoder.reset)
+        self.clock = ClockOffset()
+
+        self.playing = False
+        self._index = 0
+        self._sent_at = {}
+
+        self.acked = 0
+        self.key_inputs = 0
+        self.round_trips = []
+        self.deliveries = []
+        self.failed = False
+
+    def _next_frame(self, frame_id: int):
+        gs = self.encoder.encode(self.frames[self._index % len(self.frames)], self.codec, frame_id)
+        gs.timestamp = time.time()
+        self._sent_at[frame_id] = gs.timestamp
+        return gs
+
+    def _on_state(self, state):
+        now = time.time()
+
+        if state.command == Command.FrameAck:
+            self.stream.acknowledge(state.frame_id)
+            self.encoder.acknowledge(state.frame_id)
+            sent_at = self._sent_at.pop(state.frame_id, None)
+            if sent_at is not None:
+                self.acked += 1
+                self.round_trips.append((now - sent_at) * 1000)
+                self.clock.add(sent_at, state.timestamp, state.timestamp, now)
+            return
+
+        if state.timestamp and self.clock.offset is not None:
+            # The clock offset is the server's lead over this host, estimated from the acks.
+            self.deliveries.append((now - (state.timestamp - self.clock.offset)) * 1000)
+
+        if state.command == Command.ChangeConfig:
+            config = config_from_message(state.config)
+            self.fps = config.get('fps') or self.fps
+            self.codec = config.get('codec', self.codec)
+        elif state.command == Command.StartGame:
+            self.playing = True
+        elif state.command == Command.AbortGame:
+            self.playing = False
+        elif state.command == Command.KeyInput:
+            self.key_inputs += 1
+        elif state.command == Command.Disconnect:
+            self.stream.close()
+
+    async def _listen(self, stub):
+        try:
+            async for state in stub.GameStream(self.stream, metadata=((SESSION_TOKEN_KEY, self.token),)):
+                self._on_state(state)
+        except (grpc.RpcError, asyncio.CancelledError):
+            self.failed = not self.stream.closed
+
+    async def run(self, duration: float):
+        channel = grpc.aio.insecure_channel(self.address, options=CHANNEL_OPTIONS)
+        listener = asyncio.ensure_future(self._listen(rpc.ExperimentServiceStub(channel)))
+
+        end = time.perf_counter() + duration
+        next_tick = time.perf_counter()
+        while time.perf_counter() < end and not self.stream.closed:
+            self._index += 1
+            self.stream.notify_frame()
+
+            next_tick += 1 / self.fps
+            await asyncio.sleep(max(next_tick - time.perf_counter(), 0))
+
+        # Leave on purpose, so the server frees the session instead of holding it for a resume.
+        self.stream.send(pb.GameSync(leave=True))
+        self.stream.close()
+        await asyncio.wait([listener], timeout=1.0)
+        await channel.close()
+        await listener
+
+    def result(self) -> dict:
+        return {'acked': self.acked, 'key_inputs': self.key_inputs, 'round_trips': self.round_trips,
+                'deliveries': self.deliveries, 'failed': self.failed}
+
+
+def process_cpu_seconds(pid: int) -> float:
+    # utime + stime from /proc, so no extra dependency is needed to watch a server on this host.
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def _run_clients(address: str, tokens: list, frames: list, fps: int, duration: float) -> list:
+    clients = [VirtualClient(address, token, frames, fps) for token in tokens]
+    await asyncio.gather(*(client.run(duration) for client in clients))
+    return [client.result() for client in clients]
+
+
+def _run_worker(address: str, tokens: list, recorded: bool, fps: int, duration: float) -> tuple:
+    frames = load_frames(recorded)
+    started = time.process_time()
+    results = asyncio.run(_run_clients(address, tokens, frames, fps, duration))
+    return results, time.process_time() - started
+
+
+def load_frames(recorded: bool) -> list:
+    if recorded:
+        from common import sample_frames
+        return sample_frames(60)
+    return synthetic_frames()
+
+
+def run(address: str, count: int, processes: int, recorded: bool, fps: int, duration: float,
+        server_pid: int = None) -> dict:
+    tokens = [f'load-{os.getpid()}-{count}-{i}' for i in range(count)]
+    shares = [tokens[i::processes] for i in range(processes) if tokens[i::processes]]
+
+    server_cpu = process_cpu_seconds(server_pid) if server_pid else None
+    with futures.ProcessPoolExecutor(max_workers=len(shares)) as executor:
+        outcomes = list(executor.map(_run_worker, [address] * len(shares), shares, [recorded] * len(shares),
+                                     [fps] * len(shares), [duration] * len(shares)))
+    if server_pid:
+        server_cpu = process_cpu_seconds(server_pid) - server_cpu
+
+    results = [result for share, _ in outcomes for result in share]
+    per_session = [result['acked'] / duration for result in results]
+    round_trips = [rtt for result in results for rtt in result['round_trips']]
+    deliveries = [ms for result in results for ms in result['deliveries']]
+
+    return {
+        'fps': sum(per_session),
+        'min_fps': min(per_session),
+        'rtt_p50': percentile(round_trips, 50),
+        'rtt_p95': percentile(round_trips, 95),
+        'rtt_p99': percentile(round_trips, 99),
+        'cmd_p95': percentile(deliveries, 95),
+        'server_cpu': None if server_cpu is None else server_cpu / duration * 100,
+        'client_cpu': sum(cpu for _, cpu in outcomes) / duration * 100,
+        'failed': sum(result['failed'] for result in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Streams N headless virtual participants to an experiment server.')
+    parser.add_argument('address', nargs='?', default='localhost:11912')
+    parser.add_argument('-n', '--sessions', type=int, nargs='+', default=[1, 4, 8, 16],
+                        help='session counts to run one after another')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per session count')
+    parser.add_argument('--fps', type=int, default=DEFAULT_FPS, help='until the server configures another rate')
+    parser.add_argument('--processes', type=int, default=1, help='generator processes to spread clients over')
+    parser.add_argument('--recorded', action='store_true', help='stream rendered Overcooked frames')
+    parser.add_argument('--server-pid', type=int, help='server process on this host to measure CPU of')
+    args = parser.parse_args()
+
+    print(f'{"sessions":<10}{"frames/s":>10}{"min fps":>9}{"ack p50":>9}{"ack p95":>9}{"ack p99":>9}'
+          f'{"cmd p95":>9}{"srv CPU%":>10}{"CPU%/sess":>11}{"gen CPU%":>10}{"failed":>8}')
+    for count in args.sessions:
+        r = run(args.address, count, args.processes, args.recorded, args.fps, args.duration, args.server_pid)
+        server_cpu = '-' if r['server_cpu'] is None else f'{r["server_cpu"]:.0f}'
+        per_session = '-' if r['server_cpu'] is None else f'{r["server_cpu"] / count:.1f}'
+        print(f'{count:<10}{r["fps"]:>10.0f}{r["min_fps"]:>9.1f}{r["rtt_p50"]:>9.1f}{r["rtt_p95"]:>9.1f}'
+              f'{r["rtt_p99"]:>9.1f}{r["cmd_p95"]:>9.1f}{server_cpu:>10}{per_session:>11}'
+              f'{r["client_cpu"]:>10.0f}{r["failed"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,132 +1,188 @@
+import argparse
 import datetime
+import os
 import sys, threading
 import json
-import time
 
+from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtWidgets import QDesktopWidget, QInputDialog, QApplication, QWidget, QLabel, QVBoxLayout, \
     QHBoxLayout, QPushButton, QGridLayout, QTextBrowser
 
 
-import grpc
 import experimentservice_pb2 as pb
-import experimentservice_pb2_grpc as rpc
+
+from overcooked_ai_py.env import state_from_dict
 
 from wrapper.gym_wrapper import GymWrapper
 
-from utils.infinite_iterator import InfiniteIterator
+from utils.frame_producer import FrameProducer, DEFAULT_FPS
+from utils.frame_codec import negotiate_codec
+from utils.frame_delta import DeltaEncoder
+from utils.frame_ring import FrameRing, is_local_host
+from utils.event_loop import EventLoopThread
+from utils.messages import config_from_message, fill_game_state
+from utils.metrics import start_exporter, CLIENT_METRICS_PORT
+from utils.lockstep import DEFAULT_TICK_RATE
+
+from client_transport import ClientTransport
 
 
 from enums.commands import Command
 from enums.status import Status
+from enums.codec import Codec
+from enums.sync_mode import SyncMode
+from enums.frame_transport import FrameTransport
 
 
 class ClientApp(QWidget):
 
-    def __init__(self):
+    # Transport and game callbacks run on the network and game threads; these hand them over to the GUI thread.
+    connected = pyqtSignal()
+    reconnecting = pyqtSignal()
+    disconnected = pyqtSignal(bool)
+    command_received = pyqtSignal(object)
+    close_requested = pyqtSignal()
+
+    def __init__(self, headless: bool = False, connect_to: str = None):
         super().__init__()
 
         self.game_screen = None
         self.config = {
             'level': 'asymmetric_advantages',
             'duration': 120,
-            'player': 'Bot'
+            'player': 'Bot',
+            'codec': Codec.Raw,
+            'sync_mode': SyncMode.Screen,
+            'frame_transport': FrameTransport.Network,
+            'fps': DEFAULT_FPS,
+            'tick_rate': DEFAULT_TICK_RATE
         }
 
         self._current_screen = None
-        self.conn = None
-        self.connect_listener = None
-        self.thr_heartbeat = None
 
-        self.inf_iterator = InfiniteIterator()
+        # Control commands may overtake tick states queued before them, so states arriving after an abort are stale.
+        self._in_game = False
+
+        self.frame_encoder = DeltaEncoder()
+
+        self._host = None
+        self._frame_ring = None
+        self._frame_ring_lock = threading.Lock()
 
         self.initUI()
-        self.game_wrapper = GymWrapper()
-        self.game_wrapper.on_close(self.close)
+        self.connected.connect(self._on_connected)
+        self.reconnecting.connect(self._on_reconnecting)
+        self.disconnected.connect(self._on_disconnected)
+        self.command_received.connect(self._on_command)
+        self.close_requested.connect(self.close)
 
+        self.game_wrapper = GymWrapper(headless=headless)
+        self.game_wrapper.on_close(self.close_requested.emit)
+        self.game_wrapper.on_key_input(self._on_key_input)
 
-    def on_connect_pressed(self):
-        text, ok = QInputDialog.getText(self, 'Connect', 'Enter IP Address:')
+        self.frame_producer = FrameProducer(self.game_wrapper, fps=self.config['fps'])
 
-        if text != '':
-            address = text
-        else:
-            address = 'localhost'
+        # Networking and frame sampling share one event loop; the game keeps its own thread.
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
 
-        port = 11912
+        self.transport = ClientTransport(self.loop_thread, self._next_game_sync)
+        self.transport.on_connected(self._on_transport_connected)
+        self.transport.on_disconnected(self.disconnected.emit)
+        self.transport.on_reconnecting(self.reconnecting.emit)
+        self.transport.on_state(self._on_state)
+        self.transport.on_frames_lost(self.frame_encoder.reset)
+        self.transport.on_frame_acked(self.frame_encoder.acknowledge)
 
-        if ok:
-            self.add_log(f'Connecting to {address}:{port}')
-            self._on_status_changed(Status.Connecting)
+        self.frame_producer.on_frame(self.transport.notify_frame)
+        self.loop_thread.submit(self.frame_producer.run())
 
-            channel = grpc.insecure_channel(address + ':' + str(port))
+        # A second client on the same host finds the port taken and goes without.
+        if start_exporter(CLIENT_METRICS_PORT):
+            self.add_log(f'Prometheus metrics on http://127.0.0.1:{CLIENT_METRICS_PORT}/metrics')
 
-            self.conn = rpc.ExperimentServiceStub(channel)
+        if connect_to is not None:
+            self.connect_server(connect_to)
+
+    def on_connect_pressed(self):
+        text, ok = QInputDialog.getText(self, 'Connect', 'Enter IP Address:')
 
-            def connect_on_background():
-                try:
-                    grpc.channel_ready_future(channel).result(timeout=10)
-                    is_connected = True
-                except grpc.FutureTimeoutError:
-                    is_connected = False
+        if ok:
+            self.connect_server(text or 'localhost')
 
-                if not is_connected:
-                    self.disconnect_server()
-                    return
+    def connect_server(self, address: str, port: int = 11912):
+        self.add_log(f'Connecting to {address}:{port}')
+        self._on_status_changed(Status.Connecting)
 
-                # create new listening thread for when new message streams come in
-                self.command_listener = threading.Thread(target=self._listen_for_messages, daemon=False)
-                self.command_listener.start()
+        self._host = address
+        self._address = f'{address}:{port}'
+        self.transport.connect(address, port)
 
-                self.thr_heartbeat = threading.Thread(target=self._heart_beat, daemon=False)
-                self.thr_heartbeat.start()
+    def _on_transport_connected(self):
+        # The server has no frame to patch yet, so start over from a keyframe before the first one goes out.
+        self.frame_encoder.reset()
+        self.connected.emit()
 
-                self._on_status_changed(Status.Connected)
-                self.add_log(f'Connected to {address}:{port}')
+    def _on_connected(self):
+        self._on_status_changed(Status.Connected)
+        self.add_log(f'Connected to {self._address}')
 
-                # Threading
-                self.thr_rendering = threading.Thread(target=self._render_game_loop, args=(self,))
-                self.thr_rendering.start()
+    def _on_reconnecting(self):
+        # The game goes on locally; the server replays whatever it sent in the meantime.
+        self.add_log('Connection lost, reconnecting')
+        self._on_status_changed(Status.Connecting)
 
-                self.thr_syncgame = threading.Thread(target=self._send_game_screen, args=(self,))
-                self.thr_syncgame.start()
+    def _on_disconnected(self, was_connected: bool):
+        if was_connected:
+            stats = self.frame_producer.stats()
+            self.add_log(f'Frames produced: {stats["produced"]}, skipped: {stats["skipped"]}, sent: {stats["sent"]}')
 
-            t1 = threading.Thread(target=connect_on_background, daemon=False)
-            t1.start()
+            stats = self.game_wrapper.stats()
+            jitter = stats['jitter']
+            self.add_log(f'Game ticks: {stats["ticks"]}, overruns: {stats["overruns"]}, skipped: {stats["skipped"]}, '
+                         f'rendered: {stats["renders"]}, jitter p95: {jitter.get("p95", 0):.1f} ms')
 
-    def _heart_beat(self):
-        while True:
-            if self.conn is not None:
-                try:
-                    self.conn.HealthCheck(pb.Empty())
-                except:
-                    pass
-            time.sleep(0.1)
+            inputs = stats['inputs']
+            self.add_log(f'Inputs applied: {inputs["consumed"]}, coalesced: {inputs["coalesced"]}, '
+                         f'dropped: {inputs["dropped"]}, age p95: {inputs["age"].get("p95", 0):.1f} ms')
 
-    def _listen_for_messages(self):
+        self._close_frame_ring()
+        self._on_status_changed(Status.Disconnected)
 
-        try:
-            for state in self.conn.ServerSignal(pb.Empty()):  # this line will wait for new messages from the server!
+    def _on_state(self, state):
+        # On the network loop: game data goes straight to the game thread, the rest to the GUI thread.
+        if state.command == Command.TickState:
+            if not self._in_game:
+                return
+            game_state = state.game_state
+            self.game_wrapper.set_state(game_state.level, state_from_dict(json.loads(game_state.state)),
+                                        game_state.time_left, game_state.score)
 
-                if state.command == Command.ChangeConfig:
-                    self.change_config(json.loads(state.payload))
+        elif state.command == Command.KeyInput:
+            self.game_wrapper.remote_action(state.key_input.action, state.key_input.sequence)
 
-                elif state.command == Command.StartGame:
-                    self.start_game()
-                    self.status_lbl.setText(Status.Progressing)
+        else:
+            if state.command == Command.StartGame:
+                self._in_game = True
+            elif state.command in (Command.AbortGame, Command.Disconnect):
+                self._in_game = False
+            self.command_received.emit(state)
+
+    def _on_command(self, state):
+        if state.command == Command.ChangeConfig:
+            self.change_config(config_from_message(state.config))
+
+        elif state.command == Command.StartGame:
+            self.start_game()
+            self.status_lbl.setText(Status.Progressing)
 
-                elif state.command == Command.AbortGame:
-                    self.abort_game()
-                    self.status_lbl.setText(Status.Connected)
-                    self.add_log('Game aborted by server')
-                elif state.command == Command.KeyInput:
-                    self.game_wrapper.remote_action(int(state.payload))
+        elif state.command == Command.AbortGame:
+            self.abort_game()
+            self.status_lbl.setText(Status.Connected)
+            self.add_log('Game aborted by server')
 
-                elif state.command == Command.Disconnect:
-                    self.disconnect_server()
-                    self.add_log('Disconnected by server')
-                    break
-        except:
-            self.disconnect_server()
+        elif state.command == Command.Disconnect:
+            self.add_log('Disconnected by server')
 
     def change_config(self, config):
         old_config = self.config
@@ -136,8 +192,11 @@ class ClientApp(QWidget):
             self.duration_lbl.setText(str(self.config['duration']))
             self.add_log(f'Config changed (duration: {old_config["duration"]}->{config["duration"]})')
 
+        self.frame_producer.fps = self.config.get('fps') or DEFAULT_FPS
+        self.game_wrapper.set_tick_rate(self.config.get('tick_rate') or DEFAULT_TICK_RATE)
         self.game_wrapper.set_duration(self.config['duration'])
         self.game_wrapper.set_level(self.config['level'])
+        self.game_wrapper.set_lockstep(self.config.get('sync_mode') == SyncMode.Lockstep)
 
     def _on_status_changed(self, state: str):
         if state == Status.Disconnected:
@@ -166,15 +225,7 @@ class ClientApp(QWidget):
         self.game_wrapper.abort_game()
 
     def disconnect_server(self):
-        self.conn = None
-        self.server = None
-
-        self._on_status_changed(Status.Disconnected)
-
-        if hasattr(self, 'thr_syncgame'):
-            del self.thr_syncgame
-        if hasattr(self, 'thr_rendering'):
-            del self.thr_rendering
+        self.transport.disconnect()
 
     def add_log(self, text):
         self.log_tb.append('[' + str(datetime.datetime.now()) + '] ' + text)
@@ -241,33 +292,101 @@ class ClientApp(QWidget):
         # TODO Implement load a game level in pygame.
         print('on_level_changed', level)
 
-    def _render_game_loop(self, window_context):
+    def _on_key_input(self, action: int):
+        # Lockstep only: the key goes to the server's simulation instead of a local step.
+        gs = pb.GameSync()
+        gs.actions.append(action)
+        self.transport.send(gs)
+
+    def _next_game_sync(self, frame_id: int):
+        frame = self.frame_producer.take()
+        if frame is None:
+            return None
+
+        # The server renders lockstep games itself, so no frames go upstream.
+        if self.config.get('sync_mode') == SyncMode.Lockstep:
+            return None
+
+        gs = self._make_state_sync()
+        if gs is not None:
+            gs.frame_id = frame_id
+            gs.timestamp = frame.timestamp
+            gs.action_id = frame.action_id
+            return gs
+
+        gs = self._make_shared_sync(frame)
+        if gs is not None:
+            gs.frame_id = frame_id
+            return gs
+
+        # Deltas build on the last frame the server acked (see on_frame_acked); one it never acks is never a base.
+        codec = negotiate_codec(self.config.get('codec', Codec.Raw))
+        gs = self.frame_encoder.encode(frame.image, codec, frame_id)
+        gs.timestamp = frame.timestamp
+        gs.action_id = frame.action_id
+        return gs
+
+    def _make_shared_sync(self, frame):
+        # On the server's host the frame goes through shared memory and gRPC only says where to find it.
+        if self.config.get('frame_transport') != FrameTransport.SharedMemory or not is_local_host(self._host):
+            self._close_frame_ring()
+            return None
+
+        with self._frame_ring_lock:
+            if self._frame_ring is None or self._frame_ring.shape != frame.image.shape:
+                if self._frame_ring is not None:
+                    self._frame_ring.close()
+                self._frame_ring = FrameRing.create('turingtest-' + self.transport.session_token[:16],
+                                                    frame.image.shape)
 
-        while True:
-            if not hasattr(self, 'game_wrapper'): continue
-            image = self.game_wrapper.render()
             gs = pb.GameSync()
-            gs.screen = image.tobytes()
-            window_context.inf_iterator.set_value(gs)
+            gs.height, gs.width = frame.image.shape[:2]
+            gs.shm_name = self._frame_ring.name
+            gs.shm_sequence = self._frame_ring.write(frame.image)
+
+        gs.timestamp = frame.timestamp
+        gs.action_id = frame.action_id
+        return gs
+
+    def _close_frame_ring(self):
+        with self._frame_ring_lock:
+            if self._frame_ring is None:
+                return
+            self._frame_ring.close()
+            self._frame_ring = None
+
+        # The server's decoder never saw the frames that went through the ring.
+        self.frame_encoder.reset()
+
+    def _make_state_sync(self):
+        # Screens are still streamed while no game is running, so the server is never left with a stale frame.
+        if self.config.get('sync_mode') != SyncMode.State:
+            return None
 
-    def _send_game_screen(self, window_context):
-        def get_val():
-            yield self.inf_iterator.get_value()
+        game_state = self.game_wrapper.get_game_state()
+        if game_state is None:
+            return None
 
-        while True:
-            if self.inf_iterator.is_null() == False and self.conn is not None:
-                try:
-                    self.conn.GameSyncSignal(get_val())
-                except:
-                    self._on_status_changed(Status.Disconnected)
-                    break
+        gs = pb.GameSync()
+        fill_game_state(gs.state, game_state)
+        return gs
 
     def closeEvent(self, event):
+        self.frame_producer.stop()
         self.game_wrapper.stop()
         self.disconnect_server()
+        self.loop_thread.stop()
+        self._close_frame_ring()
 
 
 if __name__ == '__main__':
-    app = QApplication(sys.argv)
-    ex = ClientApp()
+    parser = argparse.ArgumentParser(description='Turing-test experiment client.')
+    parser.add_argument('--headless', action='store_true', help='no game window, for machines without a display')
+    parser.add_argument('--connect', metavar='ADDRESS', help='connect to this server right away')
+    args, qt_args = parser.parse_known_args()
+    if args.headless:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    ex = ClientApp(headless=args.headless, connect_to=args.connect)
     sys.exit(app.exec_())
@@ -0,0 +1,269 @@
+import asyncio
+import time
+import traceback
+import uuid
+
+import grpc
+import experimentservice_pb2 as pb
+import experimentservice_pb2_grpc as rpc
+
+from enums.commands import Command
+from utils.event_loop import EventLoopThread
+from utils.frame_stream import FrameStream
+from utils.grpc_options import CHANNEL_OPTIONS, SESSION_TOKEN_KEY, RESUME_FROM_KEY
+from utils.metrics import BYTES_RECEIVED, BYTES_SENT, FRAMES_SENT, count_command
+
+CONNECT_TIMEOUT = 10
+
+# After a drop the stream is reconnected under the same token for as long as the server keeps the session.
+RESUME_WINDOW = 10.0
+RECONNECT_INTERVAL = 0.5
+
+# Commands held beyond a gap in the sequence numbers before the gap is given up on; matches the server's
+# replay buffer.
+MAX_RECEIVED_AHEAD = 256
+
+# How long a stream that was closed on purpose gets to tell the server before it is cancelled.
+CLOSE_GRACE = 1.0
+
+
+class ClientTransport(object):
+    """Client side of the GameStream RPC on grpc.aio.
+
+    connect(), disconnect(), send() and notify_frame() may be called from any thread. Callbacks run on the
+    event loop thread. When the stream drops, it is reconnected with the session token and the sequence
+    number of the last command received, so the server resumes the session and replays what was missed.
+    on_connected then fires again, and on_disconnected only once the transport gives up or is stopped.
+    """
+
+    def __init__(self, loop_thread: EventLoopThread, next_frame):
+        self.loop_thread = loop_thread
+        self._next_frame = next_frame
+
+        self.frame_stream = None
+        self.session_token = None
+
+        self._task = None
+
+        # Every command up to _last_sequence has arrived. Control commands overtake inputs on the server,
+        # so later ones that arrived early wait in _received_ahead until the gap before them closes.
+        self._last_sequence = 0
+        self._received_ahead = set()
+
+        # Server timestamp of the last command and when it arrived here, echoed back for clock sync.
+        self._last_state = (0.0, 0.0)
+
+        self._on_connected = None
+        self._on_disconnected = None
+        self._on_reconnecting = None
+        self._on_state = None
+        self._on_frames_lost = None
+        self._on_frame_acked = None
+
+    def on_connected(self, callback):
+        self._on_connected = callback
+
+    def on_disconnected(self, callback):
+        self._on_disconnected = callback
+
+    def on_reconnecting(self, callback):
+        self._on_reconnecting = callback
+
+    def on_state(self, callback):
+        self._on_state = callback
+
+    def on_frames_lost(self, callback):
+        self._on_frames_lost = callback
+
+    def on_frame_acked(self, callback):
+        # Called with the id of every frame the server accepted, the base the next deltas may build on.
+        self._on_frame_acked = callback
+
+    def connect(self, address: str, port: int):
+        self.loop_thread.call(self._start, address, port)
+
+    def disconnect(self):
+        self.loop_thread.call(self._stop)
+
+    def send(self, game_sync):
+        frame_stream = self.frame_stream
+        if frame_stream is not None:
+            # Lockstep clients send no frames, so inputs are what confirm the commands received.
+            game_sync.command_ack = self._last_sequence
+            BYTES_SENT.inc(game_sync.ByteSize())
+            frame_stream.send(game_sync)
+
+    def notify_frame(self):
+        frame_stream = self.frame_stream
+        if frame_stream is not None:
+            frame_stream.notify_frame()
+
+    def _start(self, address: str, port: int):
+        self._stop()
+
+        # The server keeps a separate session, with its own config and bot, for each token.
+        self.session_token = uuid.uuid4().hex
+        self._last_sequence = 0
+        self._received_ahead = set()
+        self._task = self.loop_thread.loop.create_task(self._run(address, port))
+
+    def _stop(self):
+        task, self._task = self._task, None
+        if task is None:
+            return
+
+        if self.frame_stream is not None:
+            # Tell the server this client is leaving rather than dropping out, so it does not hold the session.
+            self.frame_stream.send(pb.GameSync(leave=True, command_ack=self._last_sequence))
+            self.frame_stream.close()
+            self.loop_thread.loop.call_later(CLOSE_GRACE, task.cancel)
+        else:
+            task.cancel()
+
+    async def _run(self, address: str, port: int):
+        target = address + ':' + str(port)
+        was_connected = False
+        dropped_at = None
+
+        try:
+            while True:
+                metadata = [(SESSION_TOKEN_KEY, self.session_token)]
+                if was_connected:
+                    metadata.append((RESUME_FROM_KEY, str(self._last_sequence)))
+
+                timeout = CONNECT_TIMEOUT
+                if dropped_at is not None:
+                    timeout = max(dropped_at + RESUME_WINDOW - time.time(), RECONNECT_INTERVAL)
+
+                channel = await self._connect(target, timeout)
+                if channel is not None:
+                    was_connected = True
+                    dropped_at = None
+                    if await self._stream(channel, metadata):
+                        break
+                elif not was_connected:
+                    break
+
+                if dropped_at is None:
+                    dropped_at = time.time()
+                    if self._on_reconnecting is not None:
+                        self._on_reconnecting()
+                elif time.time() - dropped_at > RESUME_WINDOW:
+                    break
+                await asyncio.sleep(RECONNECT_INTERVAL)
+        except asyncio.CancelledError:
+            pass
+
+        # Stay quiet when connect() already started a newer connection in this one's place.
+        if self._task is not None and self._task is not asyncio.current_task():
+            return
+        self._task = None
+        if self._on_disconnected is not None:
+            self._on_disconnected(was_connected)
+
+    async def _connect(self, target: str, timeout: float):
+        channel = grpc.aio.insecure_channel(target, options=CHANNEL_OPTIONS)
+        try:
+            await asyncio.wait_for(channel.channel_ready(), timeout)
+        except asyncio.TimeoutError:
+            await channel.close()
+            return None
+        except asyncio.CancelledError:
+            await channel.close()
+            raise
+        return channel
+
+    async def _stream(self, channel, metadata) -> bool:
+        # True when the session is over, False when the stream dropped and may be resumed.
+        frame_stream = FrameStream(self._stamped_frame)
+        frame_stream.on_frames_lost(self._on_frames_lost)
+        self.frame_stream = frame_stream
+
+        if self._on_connected is not None:
+            self._on_connected()
+
+        left = False
+        try:
+            # Frames go up and commands come down on this single stream.
+            call = rpc.ExperimentServiceStub(channel).GameStream(frame_stream, metadata=metadata)
+            async for state in call:
+                if frame_stream.closed:
+                    # Closed on purpose; a newer connection may already own the callbacks.
+                    continue
+                self._last_state = (state.timestamp, time.time())
+                BYTES_RECEIVED.inc(state.ByteSize())
+                count_command('received', state.command)
+
+                if state.command == Command.FrameAck:
+                    frame_stream.acknowledge(state.frame_id)
+                    if self._on_frame_acked is not None:
+                        self._on_frame_acked(state.frame_id)
+                    continue
+
+                # Commands replayed after a reconnect may include some that already arrived here.
+                if state.sequence and not self._receive_sequence(state.sequence):
+                    continue
+
+                if self._on_state is not None:
+                    try:
+                        self._on_state(state)
+                    except Exception:
+                        # A command this client fails to handle ends the session, not just this task, so
+                        # on_disconnected still fires and the server lets the session go.
+                        traceback.print_exc()
+                        left = True
+                        await self._leave(call, frame_stream)
+                        break
+                if state.command == Command.Disconnect:
+                    left = True
+                    break
+            else:
+                # The server ended the stream, or this client closed its side on purpose.
+                left = True
+        except grpc.RpcError as e:
+            # NOT_FOUND: the server let the session go before this client could resume it.
+            left = frame_stream.closed or e.code() == grpc.StatusCode.NOT_FOUND
+        finally:
+            await self._close(channel, frame_stream)
+        return left
+
+    async def _leave(self, call, frame_stream):
+        # Tells the server this client is leaving and gives that a moment to get through before the channel closes.
+        frame_stream.send(pb.GameSync(leave=True, command_ack=self._last_sequence))
+        frame_stream.close()
+        try:
+            await asyncio.wait_for(call.code(), CLOSE_GRACE)
+        except asyncio.TimeoutError:
+            pass
+
+    def _receive_sequence(self, sequence: int) -> bool:
+        # False for a command that arrived before.
+        if sequence <= self._last_sequence or sequence in self._received_ahead:
+            return False
+
+        self._received_ahead.add(sequence)
+        if len(self._received_ahead) > MAX_RECEIVED_AHEAD:
+            # The server no longer has the missing commands to replay; stop waiting for them.
+            self._last_sequence = min(self._received_ahead) - 1
+        while self._last_sequence + 1 in self._received_ahead:
+            self._last_sequence += 1
+            self._received_ahead.remove(self._last_sequence)
+        return True
+
+    def _stamped_frame(self, frame_id: int):
+        game_sync = self._next_frame(frame_id)
+        if game_sync is not None:
+            game_sync.echo_timestamp, game_sync.echo_received = self._last_state
+            game_sync.sent_timestamp = time.time()
+            game_sync.command_ack = self._last_sequence
+            FRAMES_SENT.inc()
+            BYTES_SENT.inc(game_sync.ByteSize())
+        return game_sync
+
+    async def _close(self, channel, frame_stream):
+        # A newer connection may already be running, so only tear down what this one opened.
+        frame_stream.close()
+        if self.frame_stream is frame_stream:
+            self.frame_stream = None
+
+        await channel.close()
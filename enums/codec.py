@@ -0,0 +1,6 @@
+
+class Codec:
+    Raw = 0
+    Zlib = 1
+    JPEG = 2
+    PNG = 3
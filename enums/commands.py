@@ -7,4 +7,6 @@ class Command:
     Disconnect = 5
 
     # Game
-    KeyInput = 10
\ No newline at end of file
+    KeyInput = 10
+    FrameAck = 11
+    TickState = 12
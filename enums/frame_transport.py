@@ -0,0 +1,4 @@
+
+class FrameTransport:
+    Network = 'Network'
+    SharedMemory = 'SharedMemory'
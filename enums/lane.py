@@ -0,0 +1,3 @@
+class Lane:
+    Control = 'control'
+    Data = 'data'
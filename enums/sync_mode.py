@@ -0,0 +1,5 @@
+
+class SyncMode:
+    Screen = 'Screen'
+    State = 'State'
+    Lockstep = 'Lockstep'
@@ -0,0 +1,3 @@
+class WorkerMode:
+    Thread = 'Thread'
+    Process = 'Process'
@@ -1,65 +1,250 @@
-from collections import deque
-import time, threading
+import asyncio
+import threading
+import time
 
+import grpc
 import experimentservice_pb2 as pb
 import experimentservice_pb2_grpc as rpc
 
+from enums.commands import Command
+from session import Session
+from utils.command_queue import CommandQueue
+from utils.grpc_options import SESSION_TOKEN_KEY, RESUME_FROM_KEY
+from utils.metrics import BYTES_RECEIVED, BYTES_SENT, FRAMES_RECEIVED, SESSIONS, SPECTATORS, count_command
+
+# How often a waiting server stream checks whether its client went away.
+STREAM_CHECK_INTERVAL = 1.0
+
+# Streams are coroutines on one event loop, so sessions are no longer bound by a worker pool.
+MAX_SESSIONS = 256
+
+# A session whose stream dropped is kept this long for its client to reconnect and resume it.
+RESUME_WINDOW = 10.0
+
 
 class ExperimentServer(rpc.ExperimentServiceServicer):  # inheriting here from the protobuf rpc file which is generated
+    """grpc.aio servicer; every handler runs on the server's event loop.
+
+    The on_* callbacks are blocking application code, so they run on the loop's default executor.
+    A session outlives a dropped stream for RESUME_WINDOW seconds; a client that comes back with the same
+    token and a resume point continues it on a new stream, with the commands it missed replayed first.
+    """
 
     def __init__(self):
-        self.state_queue = deque()
+        self.sessions = {}
+        self._lock = threading.Lock()
 
         self._on_client_connected = None
+        self._on_client_resumed = None
         self._on_client_timeout = None
         self._on_game_sync = None
 
-        self._latest_hit = None
-        self._check_timeout()
+        self._stopped = False
 
     def stop(self):
-        self._run_check = False
+        self._stopped = True
+        for session in self.sessions_snapshot():
+            session.close()
+
+    async def _open_session(self, context) -> tuple:
+        # Clients name their session with a token; older clients are keyed by their address instead.
+        metadata = dict(context.invocation_metadata())
+        session_id = metadata.get(SESSION_TOKEN_KEY, context.peer())
+        resume_from = metadata.get(RESUME_FROM_KEY)
+
+        with self._lock:
+            is_full = session_id not in self.sessions and len(self.sessions) >= MAX_SESSIONS
+        if is_full:
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, 'Too many sessions')
+
+        with self._lock:
+            session = self.sessions.get(session_id)
+            expired = session is None and resume_from is not None
+        if expired:
+            await context.abort(grpc.StatusCode.NOT_FOUND, 'Session expired')
+
+        with self._lock:
+            session = self.sessions.get(session_id)
+            resumed = session is not None and resume_from is not None
+            if resumed:
+                replaced = None
+                queue = session.resume(context.peer(), int(resume_from))
+            else:
+                replaced = session
+                session = Session(session_id, context.peer())
+                queue = session.state_queue
+                self.sessions[session_id] = session
+                SESSIONS.set(len(self.sessions))
+
+        if replaced is not None:
+            replaced.close()
+
+        loop = asyncio.get_running_loop()
+        if not resumed:
+            await loop.run_in_executor(None, self._on_client_connected, session)
+        elif self._on_client_resumed is not None:
+            await loop.run_in_executor(None, self._on_client_resumed, session)
+
+        # The stream ends as soon as the client leaves or stops answering keepalive pings.
+        context.add_done_callback(lambda _: self._detach_session(session, queue, loop))
+        return session, queue
+
+    def _is_current(self, session: Session, queue: CommandQueue) -> bool:
+        # False once the session was replaced, or resumed on a newer stream with a queue of its own.
+        with self._lock:
+            return self.sessions.get(session.session_id) is session and session.state_queue is queue
+
+    def _detach_session(self, session: Session, queue: CommandQueue, loop):
+        if self._stopped or not self._is_current(session, queue):
+            return
+
+        # Commands keep queueing while the client is away, and are replayed if it resumes in time.
+        session.detach()
+        loop.call_later(RESUME_WINDOW, self._expire_session, session, queue)
+
+    def _expire_session(self, session: Session, queue: CommandQueue):
+        if session.detached and self._is_current(session, queue):
+            self._close_session(session)
+
+    def _close_session(self, session: Session):
+        with self._lock:
+            if self.sessions.get(session.session_id) is session:
+                del self.sessions[session.session_id]
+                SESSIONS.set(len(self.sessions))
+            else:
+                # Already replaced by a newer stream under the same token.
+                session = None
+
+        if session is None:
+            return
+
+        session.close()
+        if not self._stopped and self._on_client_timeout is not None:
+            threading.Thread(target=self._on_client_timeout, args=(session,), daemon=True).start()
 
-    def _check_timeout(self):
-        self._run_check = True
-        def _update_time():
-            while self._run_check:
-                if self._latest_hit is not None:
-                    if time.time() - self._latest_hit > 2:
-                        self._on_client_timeout()
-                time.sleep(0.1)
+    def sessions_snapshot(self) -> list:
+        # The registry changes on the gRPC loop; other threads look at a copy.
+        with self._lock:
+            return list(self.sessions.values())
 
-        t1 = threading.Thread(target=_update_time, daemon=False)
-        t1.start()
+    def session_count(self) -> int:
+        with self._lock:
+            return len(self.sessions)
+
+    def get_session(self, session_id: str) -> Session:
+        with self._lock:
+            return self.sessions.get(session_id)
+
+    def find_session(self, prefix: str) -> Session:
+        # Sessions are shown by the first characters of their token; a prefix must name exactly one.
+        with self._lock:
+            matches = [session for session_id, session in self.sessions.items() if session_id.startswith(prefix)]
+        return matches[0] if len(matches) == 1 else None
 
     def on_client_connected(self, callback):
         self._on_client_connected = callback
 
+    def on_client_resumed(self, callback):
+        self._on_client_resumed = callback
+
     def on_client_timeout(self, callback):
         self._on_client_timeout = callback
 
     def on_game_sync(self, callback):
         self._on_game_sync = callback
 
-    def ServerSignal(self, request: pb.Empty, context):
-
-        self._on_client_connected(context.peer())
-
-        while True:
-            if len(self.state_queue):
-                state = self.state_queue.popleft()
+    async def _stream_commands(self, session: Session, queue: CommandQueue, context):
+        # Bound to the queue this stream opened with; a resumed session hands the next stream a new one.
+        while not context.done() and not queue.closed:
+            state = await queue.get_async(timeout=STREAM_CHECK_INTERVAL)
+            if state is not None:
+                BYTES_SENT.inc(state.ByteSize())
+                count_command('sent', state.command)
                 yield state
-            else:
-                time.sleep(0.01)
-
-    def GameSyncSignal(self, request_iterator: pb.GameSync, context):
-        for game_sync in request_iterator:  # this line will wait for new messages from the server!
-            self._on_game_sync(game_sync)
+                if state.command == Command.Disconnect and self._is_current(session, queue):
+                    # Sent off by the server; there is nothing to resume.
+                    self._close_session(session)
+
+    async def ServerSignal(self, request: pb.Empty, context):
+
+        session, queue = await self._open_session(context)
+        async for state in self._stream_commands(session, queue, context):
+            yield state
+
+    async def _receive_frames(self, session: Session, queue: CommandQueue, request_iterator):
+        loop = asyncio.get_running_loop()
+        last_frame_id = 0
+        try:
+            async for game_sync in request_iterator:
+                received_at = time.time()
+                FRAMES_RECEIVED.inc()
+                BYTES_RECEIVED.inc(game_sync.ByteSize())
+                if game_sync.command_ack:
+                    session.acknowledge(game_sync.command_ack)
+                if game_sync.leave:
+                    # The client is leaving on purpose and will not resume.
+                    if self._is_current(session, queue):
+                        self._close_session(session)
+                    return
+
+                # Frames arrive in order on a single stream; anything older than the last one is stale.
+                if game_sync.frame_id and game_sync.frame_id <= last_frame_id:
+                    continue
+                last_frame_id = game_sync.frame_id
+                session.latency.frame_received(game_sync, received_at)
+
+                accepted = await loop.run_in_executor(None, self._on_game_sync, session, game_sync)
+                if accepted and game_sync.frame_id:
+                    ack = pb.State()
+                    ack.command = Command.FrameAck
+                    ack.frame_id = game_sync.frame_id
+                    session.control(ack)
+        except (grpc.RpcError, asyncio.CancelledError):
+            pass
+
+    async def GameStream(self, request_iterator, context):
+
+        session, queue = await self._open_session(context)
+        receiver = asyncio.ensure_future(self._receive_frames(session, queue, request_iterator))
+
+        try:
+            async for state in self._stream_commands(session, queue, context):
+                yield state
+        finally:
+            receiver.cancel()
+
+    async def Spectate(self, request: pb.SpectateRequest, context):
+        # Read only: spectators never open a session, and a slow one only loses frames of its own.
+        session = self.find_session(request.session_id)
+        if session is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, 'No such session')
+
+        queue = session.spectators.subscribe(request.backlog or 1)
+        SPECTATORS.inc()
+        try:
+            while not context.done() and not queue.closed:
+                game_sync = await queue.get_async(timeout=STREAM_CHECK_INTERVAL)
+                if game_sync is not None:
+                    BYTES_SENT.inc(game_sync.ByteSize())
+                    yield game_sync
+        finally:
+            SPECTATORS.dec()
+            session.spectators.unsubscribe(queue)
+
+    async def GameSyncSignal(self, request_iterator, context):
+        session = self.get_session(dict(context.invocation_metadata()).get(SESSION_TOKEN_KEY, context.peer()))
+
+        loop = asyncio.get_running_loop()
+        async for game_sync in request_iterator:  # this line will wait for new messages from the client!
+            if session is not None:
+                await loop.run_in_executor(None, self._on_game_sync, session, game_sync)
         return pb.Empty()
 
-    def HealthCheck(self, request: pb.Empty, context):
-        self._latest_hit = time.time()
+    async def HealthCheck(self, request: pb.Empty, context):
+        # Kept for older clients; liveness now comes from the streams themselves.
         return pb.Empty()
 
-    def control_client(self, state: pb.State):
-        self.state_queue.append(state)
+    def control_client(self, session_id: str, state: pb.State):
+        session = self.get_session(session_id)
+        if session is not None:
+            session.control(state)
@@ -14,13 +14,18 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x17\x65xperimentservice.proto\x12\x04grpc\"\x07\n\x05\x45mpty\")\n\x05State\x12\x0f\n\x07\x63ommand\x18\x01 \x01(\r\x12\x0f\n\x07payload\x18\x02 \x01(\t\"D\n\x08GameSync\x12\x0e\n\x06screen\x18\x01 \x01(\x0c\x12\x12\n\ntime_limit\x18\x02 \x01(\t\x12\x14\n\x0c\x65lapsed_time\x18\x03 \x01(\t2\x99\x01\n\x11\x45xperimentService\x12*\n\x0cServerSignal\x12\x0b.grpc.Empty\x1a\x0b.grpc.State0\x01\x12/\n\x0eGameSyncSignal\x12\x0e.grpc.GameSync\x1a\x0b.grpc.Empty(\x01\x12\'\n\x0bHealthCheck\x12\x0b.grpc.Empty\x1a\x0b.grpc.Emptyb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x17\x65xperimentservice.proto\x12\x04grpc\"\x07\n\x05\x45mpty\",\n\x08KeyInput\x12\x0e\n\x06\x61\x63tion\x18\x01 \x01(\r\x12\x10\n\x08sequence\x18\x02 \x01(\x04\"\xa5\x01\n\x06\x43onfig\x12\r\n\x05level\x18\x01 \x01(\t\x12\x10\n\x08\x64uration\x18\x02 \x01(\r\x12\x0e\n\x06player\x18\x03 \x01(\t\x12\x0f\n\x07\x62ot_apm\x18\x04 \x01(\r\x12\r\n\x05\x63odec\x18\x05 \x01(\r\x12\x11\n\tsync_mode\x18\x06 \x01(\t\x12\x17\n\x0f\x66rame_transport\x18\x07 \x01(\t\x12\x0b\n\x03\x66ps\x18\x08 \x01(\r\x12\x11\n\ttick_rate\x18\t \x01(\r\"\xcf\x01\n\x05State\x12\x0f\n\x07\x63ommand\x18\x01 \x01(\r\x12\x10\n\x08\x66rame_id\x18\x03 \x01(\x04\x12\x11\n\ttimestamp\x18\x04 \x01(\x01\x12\x10\n\x08sequence\x18\t \x01(\x04\x12#\n\tkey_input\x18\x06 \x01(\x0b\x32\x0e.grpc.KeyInputH\x00\x12\x1e\n\x06\x63onfig\x18\x07 \x01(\x0b\x32\x0c.grpc.ConfigH\x00\x12%\n\ngame_state\x18\x08 \x01(\x0b\x32\x0f.grpc.GameStateH\x00\x42\x06\n\x04\x62odyJ\x04\x08\x02\x10\x03J\x04\x08\x05\x10\x06\"M\n\x08TileRect\x12\t\n\x01x\x18\x01 \x01(\r\x12\t\n\x01y\x18\x02 \x01(\r\x12\r\n\x05width\x18\x03 \x01(\r\x12\x0e\n\x06height\x18\x04 \x01(\r\x12\x0c\n\x04\x64\x61ta\x18\x05 \x01(\x0c\"]\n\tGameState\x12\r\n\x05level\x18\x01 \x01(\t\x12\x10\n\x08timestep\x18\x02 \x01(\x04\x12\x11\n\ttime_left\x18\x03 \x01(\x02\x12\r\n\x05score\x18\x04 \x01(\x02\x12\r\n\x05state\x18\x05 \x01(\t\"\xb6\x03\n\x08GameSync\x12\x0e\n\x06screen\x18\x01 \x01(\x0c\x12\x12\n\ntime_limit\x18\x02 \x01(\t\x12\x14\n\x0c\x65lapsed_time\x18\x03 \x01(\t\x12\r\n\x05\x63odec\x18\x04 \x01(\r\x12\r\n\x05width\x18\x05 \x01(\r\x12\x0e\n\x06height\x18\x06 \x01(\r\x12\x10\n\x08\x66rame_id\x18\x07 \x01(\x04\x12\x10\n\x08keyframe\x18\x08 \x01(\x08\x12\x15\n\rbase_frame_id\x18\t \x01(\x04\x12\x1d\n\x05tiles\x18\n \x03(\x0b\x32\x0e.grpc.TileRect\x12\x1e\n\x05state\x18\x0b \x01(\x0b\x32\x0f.grpc.GameState\x12\x11\n\ttimestamp\x18\x0c \x01(\x01\x12\x11\n\taction_id\x18\r \x01(\x04\x12\x16\n\x0e\x65\x63ho_timestamp\x18\x0e \x01(\x01\x12\x15\n\recho_received\x18\x0f \x01(\x01\x12\x16\n\x0esent_timestamp\x18\x10 \x01(\x01\x12\x10\n\x08shm_name\x18\x11 \x01(\t\x12\x14\n\x0cshm_sequence\x18\x12 \x01(\x04\x12\x0f\n\x07\x61\x63tions\x18\x13 \x03(\r\x12\x13\n\x0b\x63ommand_ack\x18\x14 \x01(\x04\x12\r\n\x05leave\x18\x15 \x01(\x08\"6\n\x0fSpectateRequest\x12\x12\n\nsession_id\x18\x01 \x01(\t\x12\x0f\n\x07\x62\x61\x63klog\x18\x02 \x01(\r2\xfd\x01\n\x11\x45xperimentService\x12*\n\x0cServerSignal\x12\x0b.grpc.Empty\x1a\x0b.grpc.State0\x01\x12/\n\x0eGameSyncSignal\x12\x0e.grpc.GameSync\x1a\x0b.grpc.Empty(\x01\x12\'\n\x0bHealthCheck\x12\x0b.grpc.Empty\x1a\x0b.grpc.Empty\x12-\n\nGameStream\x12\x0e.grpc.GameSync\x1a\x0b.grpc.State(\x01\x30\x01\x12\x33\n\x08Spectate\x12\x15.grpc.SpectateRequest\x1a\x0e.grpc.GameSync0\x01\x62\x06proto3')
 
 
 
 _EMPTY = DESCRIPTOR.message_types_by_name['Empty']
+_KEYINPUT = DESCRIPTOR.message_types_by_name['KeyInput']
+_CONFIG = DESCRIPTOR.message_types_by_name['Config']
 _STATE = DESCRIPTOR.message_types_by_name['State']
+_TILERECT = DESCRIPTOR.message_types_by_name['TileRect']
+_GAMESTATE = DESCRIPTOR.message_types_by_name['GameState']
 _GAMESYNC = DESCRIPTOR.message_types_by_name['GameSync']
+_SPECTATEREQUEST = DESCRIPTOR.message_types_by_name['SpectateRequest']
 Empty = _reflection.GeneratedProtocolMessageType('Empty', (_message.Message,), {
   'DESCRIPTOR' : _EMPTY,
   '__module__' : 'experimentservice_pb2'
@@ -28,6 +33,20 @@ Empty = _reflection.GeneratedProtocolMessageType('Empty', (_message.Message,), {
   })
 _sym_db.RegisterMessage(Empty)
 
+KeyInput = _reflection.GeneratedProtocolMessageType('KeyInput', (_message.Message,), {
+  'DESCRIPTOR' : _KEYINPUT,
+  '__module__' : 'experimentservice_pb2'
+  # @@protoc_insertion_point(class_scope:grpc.KeyInput)
+  })
+_sym_db.RegisterMessage(KeyInput)
+
+Config = _reflection.GeneratedProtocolMessageType('Config', (_message.Message,), {
+  'DESCRIPTOR' : _CONFIG,
+  '__module__' : 'experimentservice_pb2'
+  # @@protoc_insertion_point(class_scope:grpc.Config)
+  })
+_sym_db.RegisterMessage(Config)
+
 State = _reflection.GeneratedProtocolMessageType('State', (_message.Message,), {
   'DESCRIPTOR' : _STATE,
   '__module__' : 'experimentservice_pb2'
@@ -35,6 +54,20 @@ State = _reflection.GeneratedProtocolMessageType('State', (_message.Message,), {
   })
 _sym_db.RegisterMessage(State)
 
+TileRect = _reflection.GeneratedProtocolMessageType('TileRect', (_message.Message,), {
+  'DESCRIPTOR' : _TILERECT,
+  '__module__' : 'experimentservice_pb2'
+  # @@protoc_insertion_point(class_scope:grpc.TileRect)
+  })
+_sym_db.RegisterMessage(TileRect)
+
+GameState = _reflection.GeneratedProtocolMessageType('GameState', (_message.Message,), {
+  'DESCRIPTOR' : _GAMESTATE,
+  '__module__' : 'experimentservice_pb2'
+  # @@protoc_insertion_point(class_scope:grpc.GameState)
+  })
+_sym_db.RegisterMessage(GameState)
+
 GameSync = _reflection.GeneratedProtocolMessageType('GameSync', (_message.Message,), {
   'DESCRIPTOR' : _GAMESYNC,
   '__module__' : 'experimentservice_pb2'
@@ -42,16 +75,33 @@ GameSync = _reflection.GeneratedProtocolMessageType('GameSync', (_message.Messag
   })
 _sym_db.RegisterMessage(GameSync)
 
+SpectateRequest = _reflection.GeneratedProtocolMessageType('SpectateRequest', (_message.Message,), {
+  'DESCRIPTOR' : _SPECTATEREQUEST,
+  '__module__' : 'experimentservice_pb2'
+  # @@protoc_insertion_point(class_scope:grpc.SpectateRequest)
+  })
+_sym_db.RegisterMessage(SpectateRequest)
+
 _EXPERIMENTSERVICE = DESCRIPTOR.services_by_name['ExperimentService']
 if _descriptor._USE_C_DESCRIPTORS == False:
 
   DESCRIPTOR._options = None
   _EMPTY._serialized_start=33
   _EMPTY._serialized_end=40
-  _STATE._serialized_start=42
-  _STATE._serialized_end=83
-  _GAMESYNC._serialized_start=85
-  _GAMESYNC._serialized_end=153
-  _EXPERIMENTSERVICE._serialized_start=156
-  _EXPERIMENTSERVICE._serialized_end=309
+  _KEYINPUT._serialized_start=42
+  _KEYINPUT._serialized_end=86
+  _CONFIG._serialized_start=89
+  _CONFIG._serialized_end=254
+  _STATE._serialized_start=257
+  _STATE._serialized_end=464
+  _TILERECT._serialized_start=466
+  _TILERECT._serialized_end=543
+  _GAMESTATE._serialized_start=545
+  _GAMESTATE._serialized_end=638
+  _GAMESYNC._serialized_start=641
+  _GAMESYNC._serialized_end=1079
+  _SPECTATEREQUEST._serialized_start=1081
+  _SPECTATEREQUEST._serialized_end=1135
+  _EXPERIMENTSERVICE._serialized_start=1138
+  _EXPERIMENTSERVICE._serialized_end=1391
 # @@protoc_insertion_point(module_scope)
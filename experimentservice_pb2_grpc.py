@@ -29,6 +29,16 @@ class ExperimentServiceStub(object):
                 request_serializer=experimentservice__pb2.Empty.SerializeToString,
                 response_deserializer=experimentservice__pb2.Empty.FromString,
                 )
+        self.GameStream = channel.stream_stream(
+                '/grpc.ExperimentService/GameStream',
+                request_serializer=experimentservice__pb2.GameSync.SerializeToString,
+                response_deserializer=experimentservice__pb2.State.FromString,
+                )
+        self.Spectate = channel.unary_stream(
+                '/grpc.ExperimentService/Spectate',
+                request_serializer=experimentservice__pb2.SpectateRequest.SerializeToString,
+                response_deserializer=experimentservice__pb2.GameSync.FromString,
+                )
 
 
 class ExperimentServiceServicer(object):
@@ -52,6 +62,18 @@ class ExperimentServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GameStream(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Spectate(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_ExperimentServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -70,6 +92,16 @@ def add_ExperimentServiceServicer_to_server(servicer, server):
                     request_deserializer=experimentservice__pb2.Empty.FromString,
                     response_serializer=experimentservice__pb2.Empty.SerializeToString,
             ),
+            'GameStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.GameStream,
+                    request_deserializer=experimentservice__pb2.GameSync.FromString,
+                    response_serializer=experimentservice__pb2.State.SerializeToString,
+            ),
+            'Spectate': grpc.unary_stream_rpc_method_handler(
+                    servicer.Spectate,
+                    request_deserializer=experimentservice__pb2.SpectateRequest.FromString,
+                    response_serializer=experimentservice__pb2.GameSync.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'grpc.ExperimentService', rpc_method_handlers)
@@ -130,3 +162,37 @@ class ExperimentService(object):
             experimentservice__pb2.Empty.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GameStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/grpc.ExperimentService/GameStream',
+            experimentservice__pb2.GameSync.SerializeToString,
+            experimentservice__pb2.State.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def Spectate(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/grpc.ExperimentService/Spectate',
+            experimentservice__pb2.SpectateRequest.SerializeToString,
+            experimentservice__pb2.GameSync.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -7,7 +7,7 @@ import copy
 import numpy as np
 
 from overcooked_ai_py.mdp.overcooked_env import OvercookedEnv as OriginalEnv
-from overcooked_ai_py.mdp.overcooked_mdp import OvercookedGridworld
+from overcooked_ai_py.mdp.overcooked_mdp import OvercookedGridworld, OvercookedState
 from overcooked_ai_py.visualization.state_visualizer import StateVisualizer
 from overcooked_ai_py.mdp.actions import Action
 
@@ -43,6 +43,74 @@ def _convert_action(joint_action) -> list:
     return action_set
 
 
+# Channel orders a frame can be rendered in: BGR for OpenCV and the frame codecs, RGB for pygame.
+BGR = 'BGR'
+RGB = 'RGB'
+
+RENDER_SIZE = (528, 464)
+
+# A 32-bit surface with these shifts holds B, G, R, X in memory on little-endian machines.
+_SURFACE_SHIFTS = (16, 8, 0)
+_FROM_SURFACE = {BGR: cv2.COLOR_BGRA2BGR, RGB: cv2.COLOR_BGRA2RGB}
+
+
+def _surface_pixels(surface) -> np.ndarray:
+    # The surface's own memory as height x width x 4, without copying it.
+    if surface.get_bytesize() != 4 or surface.get_shifts()[:3] != _SURFACE_SHIFTS:
+        converted = pygame.Surface(surface.get_size(), 0, 32)
+        converted.blit(surface, (0, 0))
+        surface = converted
+
+    width, height = surface.get_size()
+    rows = np.frombuffer(surface.get_buffer(), dtype=np.uint8).reshape(height, surface.get_pitch())
+    return rows[:, :width * 4].reshape(height, width, 4)
+
+
+def _scaled_buffer(buffer, size) -> np.ndarray:
+    # Reused for the resized surface pixels as long as the render size stays the same.
+    width, height = size
+    if buffer is None or buffer.shape[:2] != (height, width):
+        buffer = np.empty((height, width, 4), dtype=np.uint8)
+    return buffer
+
+
+def _render_state(visualizer, state, grid, time_left, score, size=RENDER_SIZE, order=BGR, out=None, scaled=None):
+    """Renders a state at `size` in channel order `order`, into `out` when given.
+
+    The surface's pixels are resized once to the wanted size, into `scaled` when given, and then converted
+    once to the wanted channel order, so each consumer gets its own format without converting again.
+    """
+    surface = visualizer.render_state(state=state, grid=grid,
+                                      hud_data=StateVisualizer.default_hud_data(state, time_left=time_left, score=score))
+
+    pixels = _surface_pixels(surface)
+    if tuple(size) != surface.get_size():
+        # Still BGRX: the colour conversion then writes straight into `out` at the final size.
+        pixels = cv2.resize(pixels, tuple(size), dst=scaled)
+    return cv2.cvtColor(pixels, _FROM_SURFACE[order], dst=out)
+
+
+def state_from_dict(state_dict) -> OvercookedState:
+    state_dict = copy.deepcopy(state_dict)
+    # OvercookedState.to_dict() lists the objects, while from_dict() expects them keyed
+    state_dict['objects'] = {i: obj for i, obj in enumerate(state_dict['objects'])}
+    return OvercookedState.from_dict(state_dict)
+
+
+class OverCookedRenderer():
+    """Renders states streamed from an OverCookedEnv running elsewhere."""
+
+    def __init__(self, scenario="tutorial_0"):
+        self.scenario = scenario
+        self.grid = OvercookedGridworld.from_layout_name(scenario).terrain_mtx
+        self.visualizer = StateVisualizer()
+        self._scaled = None
+
+    def render(self, state, time_left, score, size=RENDER_SIZE, order=BGR, out=None):
+        self._scaled = _scaled_buffer(self._scaled, size)
+        return _render_state(self.visualizer, state, self.grid, time_left, score, size, order, out, self._scaled)
+
+
 class OverCookedEnv():
     
     def __init__(self,
@@ -58,6 +126,7 @@ class OverCookedEnv():
         base_mdp = OvercookedGridworld.from_layout_name(scenario)
         self.overcooked = OriginalEnv.from_mdp(base_mdp, horizon=episode_length)
         self.visualizer = StateVisualizer()
+        self._scaled = None
 
         self.t = time_measure()
         self.time_limit = time_limit
@@ -72,19 +141,18 @@ class OverCookedEnv():
         return None
         return self._get_observation()
 
-    def render(self, mode='rgb_array'):
+    def render(self, mode='rgb_array', size=RENDER_SIZE, order=BGR, out=None):
         t = self.time_limit - self.t.time_passed()
-        image = self.visualizer.render_state(state=self.overcooked.state, grid=self.overcooked.mdp.terrain_mtx,
-                                             hud_data=StateVisualizer.default_hud_data(self.overcooked.state, time_left = t, score = self.score))
-
-        buffer = pygame.surfarray.array3d(image)
-        image = copy.deepcopy(buffer)
-        image = np.flip(np.rot90(image, 3), 1)
-
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        image = cv2.resize(image, (528, 464))
-
-        return image
+        self._scaled = _scaled_buffer(self._scaled, size)
+        return _render_state(self.visualizer, self.overcooked.state, self.overcooked.mdp.terrain_mtx, t, self.score,
+                             size, order, out, self._scaled)
+
+    def get_state(self) -> dict:
+        return {
+            'state': self.overcooked.state.to_dict(),
+            'time_left': self.time_limit - self.t.time_passed(),
+            'score': self.score
+        }
 
     def step(self, action):
         action = _convert_action(action)
@@ -1,11 +1,13 @@
+import argparse
 import datetime, random
 import numpy as np
-import sys, time
+import os
+import sys
 import json
-from concurrent import futures
+import copy
 from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QInputDialog, QTextBrowser, \
-    QHBoxLayout, QPushButton, QGridLayout, QSlider
-from PyQt5.QtCore import Qt
+    QHBoxLayout, QPushButton, QGridLayout, QSlider, QComboBox, QFileDialog
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 
 import grpc
 import experimentservice_pb2 as pb
@@ -13,36 +15,101 @@ import experimentservice_pb2_grpc as rpc
 
 from enums.commands import Command
 from enums.status import Status
+from enums.codec import Codec
+from enums.sync_mode import SyncMode
+from enums.frame_transport import FrameTransport
+from enums.worker_mode import WorkerMode
+from enums.lane import Lane
 
 from experiment_service import ExperimentServer
+from session import Session
 
 from wrapper.dummy_wrapper import DummyWrapper
 
+from utils.frame_codec import CODEC_NAMES, SUPPORTED_CODECS
+from utils.bot_pool import BotWorkerPool
+from utils.bot_scheduler import BotScheduler
+from utils.broadcast import keyframe_message
+from utils.frame_delta import DeltaDecoder
+from utils.frame_ring import FrameRing, is_local_peer
+from utils.lockstep import LockstepSimulation, DEFAULT_TICK_RATE
+from utils.event_loop import EventLoopThread
+from utils.messages import config_message, fill_game_state
+from utils.frame_producer import DEFAULT_FPS
+from utils.grpc_options import SERVER_OPTIONS
+from utils.metrics import start_exporter, SERVER_METRICS_PORT
+
+from overcooked_ai_py.env import state_from_dict
+
 from bots.RandomAgent import RandomAgent as Bot
 
+# How often the latency percentiles of the selected session are written to the log.
+LATENCY_LOG_INTERVAL_MS = 10000
+
+# Bot inference runs on these workers; use processes for CPU-heavy bots that do not keep per-call state.
+BOT_WORKERS = 2
+BOT_WORKER_MODE = WorkerMode.Thread
+
 class ServerApp(QWidget):
 
-    def __init__(self):
+    # Sessions come and go on gRPC threads; these hand them over to the GUI thread.
+    session_opened = pyqtSignal(object)
+    session_closed = pyqtSignal(object)
+    session_resumed = pyqtSignal(object)
+    game_finished = pyqtSignal(object)
+
+    def __init__(self, headless: bool = False):
         super().__init__()
 
-        self.config = {
+        # New sessions start from a copy of this config.
+        self.default_config = {
             'level': 'asymmetric_advantages',
             'duration': 120,
             'player': 'Bot',
-            'bot_apm': 80
+            'bot_apm': 80,
+            'codec': Codec.JPEG,
+            'sync_mode': SyncMode.Screen,
+            'frame_transport': FrameTransport.Network,
+            'fps': DEFAULT_FPS,
+            'tick_rate': DEFAULT_TICK_RATE
         }
+        self.session = None
 
-        self._game_screen = np.zeros((600, 800, 3), dtype=np.uint8)
-
-        self.game_wrapper = DummyWrapper()
+        self.game_wrapper = DummyWrapper(headless=headless)
         self.game_wrapper.on_action(self._on_human_action)
         self.game_wrapper.on_close(self.close)
 
-        self._bot_last_action = None
-        self.bot_instance = Bot()
+        self.session_opened.connect(self._on_session_opened)
+        self.session_closed.connect(self._on_session_closed)
+        self.session_resumed.connect(self._on_session_resumed)
+        self.game_finished.connect(self._on_game_finished)
+
+        # Bots act on their own clock with the latest observation, not whenever a frame happens to arrive.
+        self.bot_scheduler = BotScheduler()
+        self.bot_scheduler.on_decision(self._on_bot_decision)
+        self.bot_scheduler.on_drift(lambda session, due, fired: session.latency.record('bot_drift', fired - due))
+        self.bot_scheduler.start()
+
+        self.bot_pool = BotWorkerPool(workers=BOT_WORKERS, mode=BOT_WORKER_MODE)
+        self.bot_pool.on_action(self._send_action)
+        self.bot_pool.on_inference(lambda session, seconds: session.latency.record('bot_inference', seconds))
+        self.bot_pool.start()
 
         self.initUI()
 
+        self.latency_timer = QTimer(self)
+        self.latency_timer.timeout.connect(self._log_latency)
+        self.latency_timer.start(LATENCY_LOG_INTERVAL_MS)
+
+        self._start_metrics_exporter()
+
+    @property
+    def config(self):
+        # The controls edit the selected session, or the defaults while nobody is connected.
+        if self.session is not None:
+            return self.session.config
+        return self.default_config
+
     def _start_service(self):
 
         port = 11912
@@ -50,73 +117,190 @@ class ServerApp(QWidget):
         self.server_manager = ExperimentServer()
         self.server_manager.on_client_connected(self.on_client_connected)
         self.server_manager.on_game_sync(self.on_game_sync)
+        self.server_manager.on_client_resumed(self.on_client_resumed)
         self.server_manager.on_client_timeout(self.on_client_timeout)
 
-        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
-        rpc.add_ExperimentServiceServicer_to_server(self.server_manager, self.server)
-
-        self.server.add_insecure_port('[::]:' + str(port))
-        self.server.start()
+        # Every stream is a coroutine on this loop instead of a thread of its own.
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+        self.server = self.loop_thread.submit(self._serve(port)).result()
 
         self.add_log('Starting server. Listening...')
 
+    async def _serve(self, port: int):
+        server = grpc.aio.server(options=SERVER_OPTIONS)
+        rpc.add_ExperimentServiceServicer_to_server(self.server_manager, server)
+
+        server.add_insecure_port('[::]:' + str(port))
+        await server.start()
+        return server
+
     def _stop_service(self):
-        self.server.stop(grace=True)
+        # Closing the command queue first lets the open ServerSignal streams finish on their own.
         self.server_manager.stop()
+        self.loop_thread.submit(self.server.stop(grace=1.0)).result()
+        self.loop_thread.stop()
 
         if hasattr(self, 'server_manager'):
             del self.server_manager
         self.change_status(Status.Disconnected)
         self.add_log('Stopping server')
 
-    def on_client_timeout(self):
-        self._stop_service()
-        time.sleep(0.1)
-        self._start_service()
+    def on_client_timeout(self, session: Session):
+        self.bot_scheduler.unschedule(session)
+        self.session_closed.emit(session)
 
     def add_log(self, text):
         self.tb.append('[' + str(datetime.datetime.now()) + '] ' + text)
 
-    def on_client_connected(self, peer):
-        self.add_log('Client connected from ' + str(peer))
-        self.change_status(Status.Waiting)
-        self.sync_config()
-
-    def on_game_sync(self, data):
-        image = np.frombuffer(data.screen, dtype=np.uint8).reshape(600, 800, 3)
-        self.game_wrapper.set_image(image)
-
-        if self.status_lbl.text() == Status.Progressing:
-            self.on_frame_received(image)
-
-    def on_frame_received(self, obs):
+    def on_client_connected(self, session: Session):
+        session.config = copy.deepcopy(self.default_config)
+        session.bot = Bot()
+        session.frame_decoder = DeltaDecoder(np.zeros((600, 800, 3), dtype=np.uint8))
+        session.status = Status.Waiting
+
+        self.sync_config(session)
+        self.session_opened.emit(session)
+
+    def _on_session_opened(self, session: Session):
+        self.add_log(f'Client connected from {session.peer} (session {session.session_id[:8]})')
+        self.session_cb.addItem(str(session), session)
+        self._update_session_count()
+
+        if self.session is None or self.session.closed:
+            self.session_cb.setCurrentIndex(self.session_cb.count() - 1)
+
+    def on_client_resumed(self, session: Session):
+        # The client starts its frames over from a keyframe; config, bot and game carry on as they were.
+        session.frame_decoder.reset()
+        self.session_resumed.emit(session)
+
+    def _on_session_resumed(self, session: Session):
+        self.add_log(f'Client reconnected from {session.peer} (session {session.session_id[:8]})')
+        index = self.session_cb.findData(session)
+        if index >= 0:
+            self.session_cb.setItemText(index, str(session))
+
+    def _on_session_closed(self, session: Session):
+        self.add_log(f'Client timed out (session {session.session_id[:8]})')
+        index = self.session_cb.findData(session)
+        if index >= 0:
+            self.session_cb.removeItem(index)
+        self._update_session_count()
+
+    def _on_session_selected(self, index: int):
+        self.session = self.session_cb.itemData(index) if index >= 0 else None
+
+        self._update_config_labels()
+        self.slider.setValue(self.config['bot_apm'])
+        self.change_status(self.session.status if self.session is not None else Status.Disconnected)
+
+    def _update_session_count(self):
+        self.session_count_lbl.setText(str(self.server_manager.session_count()))
+
+    def on_game_sync(self, session: Session, data):
+        selected = session is self.session
+
+        if data.actions:
+            # Lockstep input from the participant; the frames come from the server's own simulation.
+            if session.simulation is not None:
+                for action in data.actions:
+                    session.simulation.submit(0, action)
+            return False
+
+        if data.HasField('state'):
+            # The bot observes the symbolic state instead of pixels in this mode.
+            obs = state_from_dict(json.loads(data.state.state))
+            if selected:
+                self.game_wrapper.set_state(data.state.level, obs, data.state.time_left, data.state.score)
+        elif data.shm_name:
+            obs = self._read_shared_frame(session, data)
+            if obs is None:
+                return False
+            if selected:
+                self.game_wrapper.set_image(obs)
+        elif session.frame_decoder.apply(data):
+            obs = session.frame_decoder.screen
+            if selected:
+                self.game_wrapper.set_image(obs)
+        else:
+            return False
 
-        if self.config['player'] == 'Bot':
-            if self._bot_last_action is None or (time.time() - self._bot_last_action > self.action_time_gap):
-                self._on_request_bot_action(obs)
-                self._bot_last_action = time.time()
+        self._publish_to_spectators(session, data, obs)
+        if session.status == Status.Progressing:
+            self.on_frame_received(session, obs)
+        return True
 
-    def _on_request_bot_action(self, obs):
-        action = self.bot_instance.get_action(obs=obs)
-        self._on_human_action(action)
+    def _publish_to_spectators(self, session: Session, data, obs):
+        if data.HasField('state'):
+            session.spectators.publish(lambda: pb.GameSync(frame_id=data.frame_id, timestamp=data.timestamp,
+                                                           state=data.state))
+        else:
+            session.spectators.publish(lambda: keyframe_message(obs, data.frame_id, data.timestamp))
+
+    def _read_shared_frame(self, session: Session, data):
+        # Only a client on this host can share its frame buffer; the pixels never cross gRPC.
+        if not is_local_peer(session.peer):
+            return None
+
+        if session.frame_ring is None or session.frame_ring.name != data.shm_name:
+            if session.frame_ring is not None:
+                session.frame_ring.close()
+                session.frame_ring = None
+            try:
+                session.frame_ring = FrameRing.attach(data.shm_name)
+            except (FileNotFoundError, ValueError):
+                return None
+
+        # The frame is kept as the observation and shown and sent on, while the client reuses its slot.
+        return session.frame_ring.read_copy(data.shm_sequence)
+
+    def on_frame_received(self, session: Session, obs):
+        session.observation = obs
+
+    def _on_bot_decision(self, session: Session):
+        if session.status != Status.Progressing or session.config['player'] != 'Bot':
+            return
+        if session.observation is not None:
+            self._on_request_bot_action(session, session.observation)
+
+    def _on_request_bot_action(self, session: Session, obs):
+        # The action is sent from a pool worker once inference finishes.
+        self.bot_pool.submit(session, obs)
 
     def _on_botapm_changed(self, value):
         self.config['bot_apm'] = value
         self.bot_apm_lbl.setText(str(self.config['bot_apm']))
 
-    def sync_config(self):
+    def sync_config(self, session: Session = None):
+        session = session or self.session
+        if session is None:
+            return
+
         state = pb.State()
         state.command = Command.ChangeConfig
-        state.payload = json.dumps(self.config)
-        self.server_manager.control_client(state)
+        state.config.CopyFrom(config_message(session.config))
+        session.control(state)
 
-    def _on_config_changed(self):
+    def _update_config_labels(self):
         self.level_lbl.setText(self.config['level'])
         self.duration_lbl.setText(str(self.config['duration']))
         self.player_lbl.setText(self.config['player'])
+        self.bot_apm_lbl.setText(str(self.config['bot_apm']))
+        self.codec_lbl.setText(CODEC_NAMES[self.config['codec']])
+        self.sync_mode_lbl.setText(self.config['sync_mode'])
+        self.transport_lbl.setText(self.config['frame_transport'])
+        self.fps_lbl.setText(str(self.config['fps']))
+        self.tick_rate_lbl.setText(str(self.config['tick_rate']))
+
+    def _on_config_changed(self):
+        self._update_config_labels()
 
         self.add_log(f'Configuration changed (level: {str(self.config["level"])}, ' +
-                     f'duration: {str(self.config["duration"])}, player: {str(self.config["player"])})')
+                     f'duration: {str(self.config["duration"])}, player: {str(self.config["player"])}, ' +
+                     f'codec: {CODEC_NAMES[self.config["codec"]]}, sync: {self.config["sync_mode"]}, ' +
+                     f'transport: {self.config["frame_transport"]}, fps: {str(self.config["fps"])}, ' +
+                     f'tick rate: {str(self.config["tick_rate"])})')
 
     def _on_change_game_level_pressed(self):
         text, ok = QInputDialog.getText(self, 'Level', 'Enter Level:')
@@ -127,7 +311,7 @@ class ServerApp(QWidget):
             self.sync_config()
 
     def _on_change_game_duration_pressed(self):
-        text, ok = QInputDialog.getInt(self, 'Duration', 'Enter Duration:')
+        text, ok = QInputDialog.getInt(self, 'Duration', 'Enter Duration:', self.config['duration'], 1, 3600)
 
         if ok:
             self.config['duration'] = text
@@ -143,7 +327,52 @@ class ServerApp(QWidget):
         self._on_config_changed()
         self.sync_config()
 
+    def _on_change_codec_pressed(self):
+        index = SUPPORTED_CODECS.index(self.config['codec'])
+        self.config['codec'] = SUPPORTED_CODECS[(index + 1) % len(SUPPORTED_CODECS)]
+
+        self._on_config_changed()
+        self.sync_config()
+
+    def _on_change_fps_pressed(self):
+        value, ok = QInputDialog.getInt(self, 'FPS', 'Enter FPS:', self.config['fps'], 1, 120)
+
+        if ok:
+            self.config['fps'] = value
+            self._on_config_changed()
+            self.sync_config()
+
+    def _on_change_tick_rate_pressed(self):
+        value, ok = QInputDialog.getInt(self, 'Tick rate', 'Enter ticks per second:', self.config['tick_rate'], 1, 60)
+
+        if ok:
+            self.config['tick_rate'] = value
+            self._on_config_changed()
+            self.sync_config()
+
+    def _on_change_sync_mode_pressed(self):
+        if self.config['sync_mode'] == SyncMode.Screen:
+            self.config['sync_mode'] = SyncMode.State
+        elif self.config['sync_mode'] == SyncMode.State:
+            self.config['sync_mode'] = SyncMode.Lockstep
+        else:
+            self.config['sync_mode'] = SyncMode.Screen
+
+        self._on_config_changed()
+        self.sync_config()
+
+    def _on_change_transport_pressed(self):
+        if self.config['frame_transport'] == FrameTransport.Network:
+            self.config['frame_transport'] = FrameTransport.SharedMemory
+        else:
+            self.config['frame_transport'] = FrameTransport.Network
+
+        self._on_config_changed()
+        self.sync_config()
+
     def change_status(self, state: str):
+        if self.session is not None and state != Status.Disconnected:
+            self.session.status = state
         self.status_lbl.setText(state)
         self._on_status_changed(state)
 
@@ -162,33 +391,134 @@ class ServerApp(QWidget):
             self.btn_disconnect.setEnabled(True)
             self.btn_start_game.setEnabled(True)
             self.btn_abort_game.setEnabled(False)
-            self._bot_last_action = None
 
     def _on_game_start_pressed(self):
+        if self.session is None:
+            return
+
         state = pb.State()
         state.command = Command.StartGame
-        self.server_manager.control_client(state)
+        self.session.control(state)
         self.change_status(Status.Progressing)
 
+        self.session.observation = None
+        self.bot_scheduler.schedule(self.session)
+
+        if self.config['sync_mode'] == SyncMode.Lockstep:
+            self._start_simulation(self.session)
+
         self.add_log('Started an experiment with below config')
         self.add_log(f'Config - (level: {str(self.config["level"])}, ' +
                      f'duration: {str(self.config["duration"])}, player: {str(self.config["player"])})')
 
     def _on_game_abort_pressed(self):
+        if self.session is None:
+            return
+
         state = pb.State()
         state.command = Command.AbortGame
-        self.server_manager.control_client(state)
+        self.session.control(state)
+        self.bot_scheduler.unschedule(self.session)
+        self._stop_simulation(self.session)
         self.change_status(Status.Waiting)
 
         self.add_log('Stopped the progressing experiment')
 
+    def _start_simulation(self, session: Session):
+        self._stop_simulation(session)
+
+        simulation = LockstepSimulation(session.config['level'], session.config['duration'],
+                                        session.config['tick_rate'])
+        simulation.on_tick(lambda tick, game_state: self._on_tick(session, tick, game_state))
+        simulation.on_finished(lambda: self.game_finished.emit(session))
+        session.simulation = simulation
+        simulation.start()
+
+    def _stop_simulation(self, session: Session):
+        if session.simulation is not None:
+            session.simulation.stop()
+
+            stats = session.simulation.stats()
+            inputs = stats['inputs']
+            self.add_log(f'Lockstep ticks: {stats["ticks"]}, late: {stats["late"]}, '
+                         f'inputs applied: {inputs["consumed"]}, coalesced: {inputs["coalesced"]}, '
+                         f'dropped: {inputs["dropped"]}')
+            session.simulation = None
+
+    def _on_tick(self, session: Session, tick: int, game_state: dict):
+        state = pb.State()
+        state.command = Command.TickState
+        state.frame_id = tick
+        fill_game_state(state.game_state, game_state)
+        session.control(state)
+        session.spectators.publish(lambda: pb.GameSync(frame_id=tick, timestamp=state.timestamp,
+                                                       state=state.game_state))
+
+        obs = state_from_dict(game_state['state'])
+        if session is self.session:
+            self.game_wrapper.set_state(game_state['level'], obs, game_state['time_left'], game_state['score'])
+        session.observation = obs
+
+    def _on_game_finished(self, session: Session):
+        self.bot_scheduler.unschedule(session)
+        self._stop_simulation(session)
+        if session.closed:
+            return
+
+        state = pb.State()
+        state.command = Command.AbortGame
+        session.control(state)
+
+        session.status = Status.Waiting
+        if session is self.session:
+            self.change_status(Status.Waiting)
+        self.add_log(f'Experiment finished (session {session.session_id[:8]})')
+
     def _on_log_clear_pressed(self):
         self.tb.clear()
 
+    def _start_metrics_exporter(self):
+        if start_exporter(SERVER_METRICS_PORT):
+            self.add_log(f'Prometheus metrics on http://127.0.0.1:{SERVER_METRICS_PORT}/metrics')
+        else:
+            self.add_log(f'Metrics port {SERVER_METRICS_PORT} is in use; metrics are not exported')
+
+    def _log_latency(self):
+        if self.session is None:
+            return
+        summary = self.session.latency.summary()
+        if summary:
+            self.add_log(f'Latency ({self.session.session_id[:8]}): {summary}')
+
+        queue = self.session.state_queue.stats()
+        self.add_log(f'Command queue: control {queue[Lane.Control]["depth"]} waiting '
+                     f'(p95 {queue[Lane.Control]["wait"].get("p95", 0):.1f} ms), data {queue[Lane.Data]["depth"]} '
+                     f'waiting (p95 {queue[Lane.Data]["wait"].get("p95", 0):.1f} ms), {queue["coalesced"]} inputs merged')
+
+        stats = self.bot_pool.stats()
+        if stats['submitted']:
+            self.add_log(f'Bot pool: {stats["completed"]} done, {stats["dropped"]} superseded, {stats["failed"]} failed')
+
+    def _on_latency_export_pressed(self):
+        path, _ = QFileDialog.getSaveFileName(self, 'Export latency', 'latency.json', 'JSON (*.json)')
+        if not path:
+            return
+
+        sessions = self.server_manager.sessions_snapshot()
+        report = {session.session_id: session.latency.snapshot(samples=True) for session in sessions}
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.add_log(f'Exported latency of {len(report)} session(s) to {path}')
+
     def _on_disconnect_pressed(self):
+        if self.session is None:
+            return
+
         state = pb.State()
         state.command = Command.Disconnect
-        self.server_manager.control_client(state)
+        self.session.control(state)
+        self.bot_scheduler.unschedule(self.session)
+        self._stop_simulation(self.session)
         self.change_status(Status.Disconnected)
         self.add_log('Client disconnected by server')
 
@@ -200,22 +530,41 @@ class ServerApp(QWidget):
         return btn
 
     def _on_human_action(self, action: int):
+        if self.session is not None:
+            self._send_action(self.session, action)
+
+    def _send_action(self, session: Session, action: int):
+        # In lockstep the partner's input goes into the server's simulation, on the same ticks as the participant's.
+        simulation = session.simulation
+        if simulation is not None:
+            simulation.submit(1, action)
+            return
+
         state = pb.State()
         state.command = Command.KeyInput
-        state.payload = str(action)
-        self.server_manager.control_client(state)
+        state.key_input.action = action
+        session.control(state)
 
     def initUI(self):
 
         # t1 = threading.Thread(target=self._render_game_loop, args=(self, ))
         # t1.start()
 
+        self.session_cb = QComboBox()
+        self.session_cb.currentIndexChanged.connect(self._on_session_selected)
+        self.session_count_lbl = QLabel('0')
+
         self.status_lbl = QLabel()
         self.level_lbl = QLabel(self.config['level'])
         self.duration_lbl = QLabel(str(self.config['duration']))
         self.player_lbl = QLabel(self.config['player'])
         self.bot_apm_lbl = QLabel(str(self.config['bot_apm']))
         self.bot_apm_lbl.setAlignment(Qt.AlignCenter)
+        self.codec_lbl = QLabel(CODEC_NAMES[self.config['codec']])
+        self.sync_mode_lbl = QLabel(self.config['sync_mode'])
+        self.fps_lbl = QLabel(str(self.config['fps']))
+        self.transport_lbl = QLabel(self.config['frame_transport'])
+        self.tick_rate_lbl = QLabel(str(self.config['tick_rate']))
 
         self.tb = QTextBrowser()
         self.tb.setOpenExternalLinks(True)
@@ -224,6 +573,14 @@ class ServerApp(QWidget):
         hbox = QHBoxLayout()
 
         control_box = QVBoxLayout()
+
+        session_box = QHBoxLayout()
+        session_box.addWidget(QLabel('Session:'))
+        session_box.addWidget(self.session_cb, 1)
+        session_box.addWidget(QLabel('Connected:'))
+        session_box.addWidget(self.session_count_lbl)
+        control_box.addLayout(session_box)
+
         grid = QGridLayout()
 
         grid.addWidget(QLabel('Status:'), 0, 0)
@@ -231,30 +588,50 @@ class ServerApp(QWidget):
         grid.addWidget(QLabel('Duration:'), 2, 0)
         grid.addWidget(QLabel('Player:'), 3, 0)
         grid.addWidget(QLabel('Bot APM:'), 4, 0)
+        grid.addWidget(QLabel('Codec:'), 5, 0)
+        grid.addWidget(QLabel('Sync:'), 6, 0)
+        grid.addWidget(QLabel('FPS:'), 7, 0)
+        grid.addWidget(QLabel('Transport:'), 8, 0)
+        grid.addWidget(QLabel('Tick rate:'), 9, 0)
 
         grid.addWidget(self.status_lbl, 0, 1)
         grid.addWidget(self.level_lbl, 1, 1)
         grid.addWidget(self.duration_lbl, 2, 1)
         grid.addWidget(self.player_lbl, 3, 1)
         grid.addWidget(self.bot_apm_lbl, 4, 2)
+        grid.addWidget(self.codec_lbl, 5, 1)
+        grid.addWidget(self.sync_mode_lbl, 6, 1)
+        grid.addWidget(self.fps_lbl, 7, 1)
+        grid.addWidget(self.transport_lbl, 8, 1)
+        grid.addWidget(self.tick_rate_lbl, 9, 1)
 
         self.btn_disconnect = self._create_button(text='Disconnect', on_clicked=self._on_disconnect_pressed)
 
         btn_level_change = self._create_button(text='Change', on_clicked=self._on_change_game_level_pressed)
         btn_duration_change = self._create_button(text='Change', on_clicked=self._on_change_game_duration_pressed)
         btn_player_change = self._create_button(text='Toggle', on_clicked=self._on_change_game_player_pressed)
-
-        slider = QSlider(Qt.Horizontal)
-        slider.setRange(50, 300)
-        slider.setSingleStep(5)
-        slider.valueChanged.connect(self._on_botapm_changed)
-        slider.setValue(self.config['bot_apm'])
+        btn_codec_change = self._create_button(text='Change', on_clicked=self._on_change_codec_pressed)
+        btn_sync_mode_change = self._create_button(text='Toggle', on_clicked=self._on_change_sync_mode_pressed)
+        btn_fps_change = self._create_button(text='Change', on_clicked=self._on_change_fps_pressed)
+        btn_transport_change = self._create_button(text='Toggle', on_clicked=self._on_change_transport_pressed)
+        btn_tick_rate_change = self._create_button(text='Change', on_clicked=self._on_change_tick_rate_pressed)
+
+        self.slider = QSlider(Qt.Horizontal)
+        self.slider.setRange(50, 300)
+        self.slider.setSingleStep(5)
+        self.slider.valueChanged.connect(self._on_botapm_changed)
+        self.slider.setValue(self.config['bot_apm'])
 
         grid.addWidget(self.btn_disconnect, 0, 2)
         grid.addWidget(btn_level_change, 1, 2)
         grid.addWidget(btn_duration_change, 2, 2)
         grid.addWidget(btn_player_change, 3, 2)
-        grid.addWidget(slider, 4, 1)
+        grid.addWidget(self.slider, 4, 1)
+        grid.addWidget(btn_codec_change, 5, 2)
+        grid.addWidget(btn_sync_mode_change, 6, 2)
+        grid.addWidget(btn_fps_change, 7, 2)
+        grid.addWidget(btn_transport_change, 8, 2)
+        grid.addWidget(btn_tick_rate_change, 9, 2)
 
 
         control_box.addLayout(grid)
@@ -269,7 +646,9 @@ class ServerApp(QWidget):
         control_box.addWidget(self.tb)
 
         btn_clear_log = self._create_button(text='Clear', on_clicked=self._on_log_clear_pressed)
+        btn_export_latency = self._create_button(text='Export latency', on_clicked=self._on_latency_export_pressed)
         control_box.addWidget(btn_clear_log)
+        control_box.addWidget(btn_export_latency)
         hbox.addStretch(5)
         hbox.addLayout(control_box)
         hbox.addStretch(5)
@@ -285,15 +664,19 @@ class ServerApp(QWidget):
         self._start_service()
 
     def closeEvent(self, event):
+        self.bot_scheduler.stop()
+        self.bot_pool.stop()
         self.game_wrapper.stop()
         self._stop_service()
 
-    @property
-    def action_time_gap(self):
-        return 60 / self.config['bot_apm']
-
 
 if __name__ == '__main__':
-   app = QApplication(sys.argv)
-   ex = ServerApp()
+   parser = argparse.ArgumentParser(description='Turing-test experiment server.')
+   parser.add_argument('--headless', action='store_true', help='no game window, for machines without a display')
+   args, qt_args = parser.parse_known_args()
+   if args.headless:
+       os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+   app = QApplication(sys.argv[:1] + qt_args)
+   ex = ServerApp(headless=args.headless)
    sys.exit(app.exec_())
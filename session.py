@@ -0,0 +1,109 @@
+from collections import deque
+import threading
+import time
+
+import experimentservice_pb2 as pb
+
+from enums.commands import Command
+from enums.status import Status
+from utils.broadcast import FrameBroadcast
+from utils.command_queue import PriorityCommandQueue, DATA_COMMANDS
+from utils.latency import LatencyTracker
+
+
+# Commands kept for replay until the client confirms them; older ones are gone if it stays away long enough.
+REPLAY_BUFFER = 256
+
+
+class Session:
+    """One participant: its command queue plus the experiment state the server keeps for it.
+
+    Control commands other than frame acks get a sequence number and stay in a replay buffer until the
+    client confirms them, so a client that reconnects under the same token gets whatever it missed with
+    resume(). Tick states and key inputs are not replayed; the next ones supersede them anyway.
+    """
+
+    def __init__(self, session_id: str, peer: str):
+        self.session_id = session_id
+        self.peer = peer
+        self.connected_at = time.time()
+        self.detached_at = None
+
+        self.state_queue = PriorityCommandQueue()
+        self.latency = LatencyTracker()
+        self.spectators = FrameBroadcast()
+
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._unacknowledged = deque()
+
+        self.config = None
+        self.status = Status.Waiting
+
+        self.bot = None
+        self.observation = None
+        self.frame_decoder = None
+        self.frame_ring = None
+        self.simulation = None
+
+    def __str__(self):
+        return f'{self.session_id[:8]} ({self.peer})'
+
+    def control(self, state: pb.State):
+        self.latency.command_sent(state)
+        with self._lock:
+            if self.state_queue.coalesce(state):
+                return
+
+            # Acks belong to the stream they answer; a new stream starts its own frame ids.
+            if state.command != Command.FrameAck and state.command not in DATA_COMMANDS:
+                self._sequence += 1
+                state.sequence = self._sequence
+                self._unacknowledged.append(state)
+                if len(self._unacknowledged) > REPLAY_BUFFER:
+                    self._unacknowledged.popleft()
+            self.state_queue.put(state)
+
+    def acknowledge(self, sequence: int):
+        # The client confirms the last command it received on everything it sends.
+        with self._lock:
+            while self._unacknowledged and self._unacknowledged[0].sequence <= sequence:
+                self._unacknowledged.popleft()
+
+    def resume(self, peer: str, sequence: int) -> PriorityCommandQueue:
+        # A fresh queue for the new stream, starting with every command after the client's last one.
+        # The old stream's queue is closed, so it cannot take commands meant for the new one.
+        with self._lock:
+            old_queue = self.state_queue
+            self.state_queue = PriorityCommandQueue()
+            for state in self._unacknowledged:
+                if state.sequence > sequence:
+                    self.state_queue.put(state)
+
+            self.peer = peer
+            self.detached_at = None
+        old_queue.close()
+        return self.state_queue
+
+    def detach(self):
+        self.detached_at = time.time()
+
+    def close(self):
+        self.state_queue.close()
+        self.spectators.close()
+        if self.simulation is not None:
+            self.simulation.stop()
+        if self.frame_ring is not None:
+            self.frame_ring.close()
+
+    @property
+    def closed(self) -> bool:
+        return self.state_queue.closed
+
+    @property
+    def detached(self) -> bool:
+        return self.detached_at is not None
+
+    @property
+    def action_time_gap(self) -> float:
+        return 60 / self.config['bot_apm']
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import json
+
+import grpc
+import numpy as np
+import pygame as pg
+import experimentservice_pb2 as pb
+import experimentservice_pb2_grpc as rpc
+
+from overcooked_ai_py.env import OverCookedRenderer, state_from_dict, RGB
+
+from utils.display import Display
+from utils.frame_codec import decode_frame
+from utils.grpc_options import CHANNEL_OPTIONS
+
+
+class Spectator:
+    """Read-only viewer of one session's game. The participant does not notice it."""
+
+    def __init__(self, address: str, session_id: str, backlog: int = 1):
+        self.address = address
+        self.session_id = session_id
+        self.backlog = backlog
+
+        self._renderer = None
+        self.frames = 0
+
+    def _image(self, game_sync, display: Display) -> np.ndarray:
+        if game_sync.HasField('state'):
+            # Sessions in State or Lockstep sync send states, which are rendered here like on the server,
+            # straight into the window's RGB buffer.
+            game_state = game_sync.state
+            if self._renderer is None or self._renderer.scenario != game_state.level:
+                self._renderer = OverCookedRenderer(scenario=game_state.level)
+            return self._renderer.render(state_from_dict(json.loads(game_state.state)), game_state.time_left,
+                                         game_state.score, size=display.size, order=RGB, out=display.frame)
+        return decode_frame(game_sync.screen, game_sync.codec, (game_sync.height, game_sync.width, 3))
+
+    async def run(self):
+        display = Display(f'Spectating {self.session_id[:8]}')
+
+        async with grpc.aio.insecure_channel(self.address, options=CHANNEL_OPTIONS) as channel:
+            request = pb.SpectateRequest(session_id=self.session_id, backlog=self.backlog)
+            try:
+                async for game_sync in rpc.ExperimentServiceStub(channel).Spectate(request):
+                    if any(event.type == pg.QUIT for event in pg.event.get()):
+                        break
+
+                    display.show(self._image(game_sync, display))
+                    self.frames += 1
+            except grpc.RpcError as e:
+                print(f'Spectating ended: {e.details()}')
+
+        pg.quit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Watches a live session of an experiment server.')
+    parser.add_argument('session', help='session token, or its first characters as the server log shows them')
+    parser.add_argument('address', nargs='?', default='localhost:11912')
+    parser.add_argument('--backlog', type=int, default=1, help='recent frames to start with')
+    args = parser.parse_args()
+
+    asyncio.run(Spectator(args.address, args.session, args.backlog).run())
+
+
+if __name__ == '__main__':
+    main()
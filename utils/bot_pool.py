@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from concurrent import futures
+import threading
+import time
+
+from enums.worker_mode import WorkerMode
+from utils.latency import LatencyHistogram
+
+
+DEFAULT_WORKERS = 2
+
+
+def _infer(bot, obs):
+    return bot.get_action(obs=obs)
+
+
+class BotWorkerPool(object):
+    """Runs bot inference on worker threads or processes, away from the scheduler and network threads.
+
+    Each session has a one-slot mailbox: a newer observation replaces one still waiting there, so workers
+    always act on the freshest state, and a session never has more than one inference running. In process
+    mode the bot is pickled with every request, so only bots without per-call state belong there.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, mode: str = WorkerMode.Thread):
+        self.workers = workers
+        self.mode = mode
+
+        self._pending = OrderedDict()
+        self._busy = set()
+        self._condition = threading.Condition()
+
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.inference = LatencyHistogram()
+
+        self._executor = None
+        self._threads = []
+        self._run = False
+
+        self._on_action = None
+        self._on_inference = None
+
+    def on_action(self, callback):
+        self._on_action = callback
+
+    def on_inference(self, callback):
+        # Called with (session, seconds) after every inference.
+        self._on_inference = callback
+
+    def start(self):
+        self._run = True
+        if self.mode == WorkerMode.Process:
+            self._executor = futures.ProcessPoolExecutor(max_workers=self.workers)
+
+        for _ in range(self.workers):
+            t1 = threading.Thread(target=self._work, daemon=True)
+            t1.start()
+            self._threads.append(t1)
+
+    def stop(self):
+        with self._condition:
+            self._run = False
+            self._pending.clear()
+            self._condition.notify_all()
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def submit(self, session, obs):
+        with self._condition:
+            if session.session_id in self._pending:
+                self.dropped += 1
+            self._pending[session.session_id] = (session, obs)
+            self.submitted += 1
+            self._condition.notify()
+
+    def _take(self):
+        # The oldest waiting session that has no inference running yet.
+        for session_id in self._pending:
+            if session_id not in self._busy:
+                self._busy.add(session_id)
+                return self._pending.pop(session_id)
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = None
+                while self._run:
+                    job = self._take()
+                    if job is not None:
+                        break
+                    self._condition.wait()
+                if job is None:
+                    return
+
+            session, obs = job
+            started = time.perf_counter()
+            try:
+                if self._executor is not None:
+                    action = self._executor.submit(_infer, session.bot, obs).result()
+                else:
+                    action = _infer(session.bot, obs)
+            except Exception:
+                action = None
+            elapsed = time.perf_counter() - started
+
+            with self._condition:
+                self._busy.discard(session.session_id)
+                if action is None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                    self.inference.add(elapsed * 1000)
+                # The session may have a newer observation waiting for this worker to finish.
+                self._condition.notify()
+
+            if self._on_inference is not None:
+                self._on_inference(session, elapsed)
+            if action is not None and self._on_action is not None and not session.closed:
+                self._on_action(session, action)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {'submitted': self.submitted, 'dropped': self.dropped, 'completed': self.completed,
+                    'failed': self.failed, 'inference': self.inference.percentiles()}
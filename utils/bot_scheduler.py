@@ -0,0 +1,96 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class BotScheduler(object):
+    """Fires bot decisions for every scheduled session at its own APM, independent of frame arrival.
+
+    One thread serves all sessions from a heap of absolute deadlines, so a stalled frame stream no longer
+    stalls the bot. The interval is read from the session on every tick, so APM changes apply right away.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._generations = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+        self.fired = 0
+        self.missed = 0
+
+        self._on_decision = None
+        self._on_drift = None
+        self._run = False
+        self._thread = None
+
+    def on_decision(self, callback):
+        self._on_decision = callback
+
+    def on_drift(self, callback):
+        # Called with (session, scheduled, fired) perf_counter times after every decision.
+        self._on_drift = callback
+
+    def start(self):
+        self._run = True
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._run = False
+            self._condition.notify()
+
+    def schedule(self, session):
+        # (Re)starts the session's clock; its first decision is one interval from now.
+        with self._condition:
+            generation = self._generations.get(session.session_id, 0) + 1
+            self._generations[session.session_id] = generation
+            self._push(time.perf_counter() + session.action_time_gap, generation, session)
+
+    def unschedule(self, session):
+        with self._condition:
+            self._generations.pop(session.session_id, None)
+
+    def _push(self, due: float, generation: int, session):
+        heapq.heappush(self._heap, (due, next(self._sequence), generation, session))
+        self._condition.notify()
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                while self._run:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] - time.perf_counter()
+                    if delay <= 0:
+                        break
+                    self._condition.wait(delay)
+                if not self._run:
+                    return
+
+                due, _, generation, session = heapq.heappop(self._heap)
+                if self._generations.get(session.session_id) != generation or session.closed:
+                    continue
+
+            fired = time.perf_counter()
+            if self._on_decision is not None:
+                self._on_decision(session)
+            self.fired += 1
+
+            if self._on_drift is not None:
+                self._on_drift(session, due, fired)
+
+            with self._condition:
+                if self._generations.get(session.session_id) != generation:
+                    continue
+
+                # Keep the original phase; if whole intervals were missed, skip them instead of bursting.
+                next_due = due + session.action_time_gap
+                now = time.perf_counter()
+                if next_due < now:
+                    self.missed += 1
+                    next_due = now + session.action_time_gap
+                self._push(next_due, generation, session)
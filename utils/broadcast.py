@@ -0,0 +1,110 @@
+from collections import deque
+import threading
+import time
+
+import experimentservice_pb2 as pb
+
+from enums.codec import Codec
+from utils.command_queue import CommandQueue
+from utils.frame_codec import encode_frame
+
+
+SPECTATOR_FPS = 15
+SPECTATOR_CODEC = Codec.JPEG
+SPECTATOR_QUEUE = 4
+
+# Recent frames kept for spectators that join late; they may ask for up to this many to start with.
+HISTORY_FRAMES = 30
+
+
+def keyframe_message(image, frame_id: int, timestamp: float) -> pb.GameSync:
+    # Spectators may miss any frame, so every one is a keyframe.
+    gs = pb.GameSync()
+    gs.frame_id = frame_id
+    gs.timestamp = timestamp
+    gs.keyframe = True
+    gs.codec = SPECTATOR_CODEC
+    gs.height, gs.width = image.shape[:2]
+    gs.screen = encode_frame(image, SPECTATOR_CODEC)
+    return gs
+
+
+class FrameBroadcast(object):
+    """Fans the frames of one session out to read-only spectators.
+
+    publish() takes a function that builds the frame message. It runs once per frame, only while someone
+    watches, and every spectator gets the same message through a bounded queue of its own, so a slow
+    spectator loses its oldest frames instead of holding up the participant. Messages must stand alone
+    (keyframes or states), since any of them may be dropped. A ring of recent frames lets a new spectator
+    start right away; when nobody watched, the latest frame is built on demand.
+    """
+
+    def __init__(self, fps: int = SPECTATOR_FPS, queue_size: int = SPECTATOR_QUEUE,
+                 history: int = HISTORY_FRAMES):
+        self.fps = fps
+        self.queue_size = queue_size
+
+        self._history = deque(maxlen=history)
+        self._subscribers = []
+        self._latest = None
+        self._published_at = 0.0
+        self._lock = threading.Lock()
+
+        self.published = 0
+
+    def publish(self, build):
+        with self._lock:
+            if not self._subscribers:
+                # Nobody watches; keep the frame unbuilt, in case somebody joins before the next one.
+                self._latest = build
+                return
+
+            now = time.perf_counter()
+            if now - self._published_at < 1 / self.fps:
+                return
+            self._published_at = now
+            self._latest = None
+
+        message = build()
+        with self._lock:
+            self._history.append(message)
+            subscribers = list(self._subscribers)
+            self.published += 1
+
+        for queue in subscribers:
+            queue.put(message)
+
+    def subscribe(self, backlog: int = 1) -> CommandQueue:
+        with self._lock:
+            latest, self._latest = self._latest, None
+        if latest is not None:
+            message = latest()
+            with self._lock:
+                self._history.append(message)
+
+        queue = CommandQueue(maxlen=max(self.queue_size, backlog))
+        with self._lock:
+            for message in list(self._history)[-backlog:] if backlog > 0 else []:
+                queue.put(message)
+            self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: CommandQueue):
+        with self._lock:
+            if queue in self._subscribers:
+                self._subscribers.remove(queue)
+            if not self._subscribers:
+                # Frames from an earlier watch are stale by the time the next spectator comes.
+                self._history.clear()
+        queue.close()
+
+    def close(self):
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+            self._latest = None
+        for queue in subscribers:
+            queue.close()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
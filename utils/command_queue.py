@@ -0,0 +1,170 @@
+from collections import deque
+import asyncio
+import threading
+import time
+
+from enums.commands import Command
+from enums.lane import Lane
+from utils.latency import LatencyHistogram
+from utils.metrics import QUEUE_WAIT_SECONDS
+
+
+# Inputs and game states are the data lane; everything else, acks included, is small and urgent.
+DATA_COMMANDS = (Command.KeyInput, Command.TickState)
+
+# Data still waiting when one of these is put belongs to a game that is over.
+GAME_BOUNDARIES = (Command.StartGame, Command.AbortGame)
+
+
+def lane_of(command: int) -> str:
+    return Lane.Data if command in DATA_COMMANDS else Lane.Control
+
+
+class CommandQueue(object):
+    """FIFO of commands whose consumers block until a command arrives or the queue is closed.
+
+    Producers may put from any thread. Consumers either block a thread with get() or await get_async()
+    on an event loop; the loop is woken through call_soon_threadsafe. With a maxlen, put() never waits:
+    the oldest command makes room and is counted in `dropped`.
+    """
+
+    def __init__(self, maxlen: int = None):
+        self._queue = deque(maxlen=maxlen)
+        self._condition = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+        self._loop = None
+        self._wakeup = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _push(self, item):
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append(item)
+
+    def _pop(self):
+        return self._queue.popleft()
+
+    def _clear(self):
+        self._queue.clear()
+
+    def put(self, item):
+        with self._condition:
+            if self._closed:
+                return
+            self._push(item)
+            self._condition.notify()
+        self._wake_async()
+
+    def get(self, timeout=None):
+        # Returns None when the queue is closed or the timeout expires before a command arrives.
+        with self._condition:
+            if not len(self) and not self._closed:
+                self._condition.wait(timeout)
+            if self._closed or not len(self):
+                return None
+            return self._pop()
+
+    async def get_async(self, timeout=None):
+        # Same contract as get(), without holding a thread while waiting.
+        if self._wakeup is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+
+        with self._condition:
+            if self._closed:
+                return None
+            if len(self):
+                return self._pop()
+            self._wakeup.clear()
+
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+        with self._condition:
+            if self._closed or not len(self):
+                return None
+            return self._pop()
+
+    def _wake_async(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._clear()
+            self._condition.notify_all()
+        self._wake_async()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+class PriorityCommandQueue(CommandQueue):
+    """CommandQueue of State messages with a control lane that always goes before the data lane.
+
+    Aborts, config changes and frame acks never wait behind key inputs or game states. Because a StartGame
+    or AbortGame overtakes them, the data still waiting is dropped when one is put, so no tick of the old
+    game reaches the client after it. A KeyInput put while the previous one still waits is merged into
+    it: the client only acts on the latest input. Depth and wait time are tracked per lane.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lanes = {Lane.Control: deque(), Lane.Data: deque()}
+        self.waits = {Lane.Control: LatencyHistogram(), Lane.Data: LatencyHistogram()}
+        self._exported = {lane: QUEUE_WAIT_SECONDS.labels(lane) for lane in self._lanes}
+        self.coalesced = 0
+        self.flushed = 0
+
+    def __len__(self):
+        return len(self._lanes[Lane.Control]) + len(self._lanes[Lane.Data])
+
+    def _push(self, state):
+        if state.command in GAME_BOUNDARIES:
+            self.flushed += len(self._lanes[Lane.Data])
+            self._lanes[Lane.Data].clear()
+        self._lanes[lane_of(state.command)].append((state, time.perf_counter()))
+
+    def _pop(self):
+        lane = Lane.Control if self._lanes[Lane.Control] else Lane.Data
+        state, queued_at = self._lanes[lane].popleft()
+
+        wait = time.perf_counter() - queued_at
+        self.waits[lane].add(wait * 1000)
+        self._exported[lane].observe(wait)
+        return state
+
+    def _clear(self):
+        for queue in self._lanes.values():
+            queue.clear()
+
+    def coalesce(self, state) -> bool:
+        # True when the key input was merged into one still waiting; the caller then drops it.
+        with self._condition:
+            data = self._lanes[Lane.Data]
+            if self._closed or state.command != Command.KeyInput or not data:
+                return False
+            waiting, _ = data[-1]
+            if waiting.command != Command.KeyInput:
+                return False
+
+            waiting.key_input.CopyFrom(state.key_input)
+            waiting.timestamp = state.timestamp
+            self.coalesced += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._condition:
+            result = {lane: {'depth': len(queue), 'wait': self.waits[lane].percentiles()}
+                      for lane, queue in self._lanes.items()}
+            result['coalesced'] = self.coalesced
+            result['flushed'] = self.flushed
+            return result
@@ -0,0 +1,40 @@
+import cv2 as cv
+import numpy as np
+import pygame as pg
+
+
+# Display loops that only show what others produce need not redraw more often than this.
+DISPLAY_FPS = 60
+
+
+class Display(object):
+    """Game window that game images are uploaded into without allocating anything per frame.
+
+    Game images are height x width BGR. They are converted into one preallocated RGB buffer, which a
+    surface made once shares, so a frame costs a single colour conversion and a blit; no transposed or
+    flipped copies and no new Surface. A renderer on the display thread may write RGB into `frame`
+    itself, which leaves only the blit.
+    """
+
+    def __init__(self, caption: str, size: tuple = (800, 600)):
+        pg.display.set_caption(caption)
+        self.screen = pg.display.set_mode(size)
+        self.size = size
+
+        width, height = size
+        self.frame = np.empty((height, width, 3), dtype=np.uint8)
+        self._surface = pg.image.frombuffer(self.frame, size, 'RGB')
+
+    def upload(self, image: np.ndarray):
+        if image is not self.frame:
+            if image.shape[:2] != self.frame.shape[:2]:
+                image = cv.resize(image, self.size)
+            cv.cvtColor(image, cv.COLOR_BGR2RGB, dst=self.frame)
+        self.screen.blit(self._surface, (0, 0))
+
+    def show(self, image: np.ndarray, changed: bool = True):
+        # Loops redrawing an unchanged screen pass changed=False and only flip. Whether an image changed is
+        # up to the caller, since decoders patch the same array in place.
+        if changed:
+            self.upload(image)
+        pg.display.flip()
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+
+class EventLoopThread(object):
+    """Runs an asyncio event loop on a background thread.
+
+    The Qt and pygame front-ends keep their own threads and hand coroutines to this loop, which runs
+    every gRPC stream without dedicating an OS thread to it.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, coro):
+        # Returns a concurrent.futures.Future, so callers outside the loop can wait on the result.
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self, timeout: float = 5.0):
+        if not self.loop.is_running():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
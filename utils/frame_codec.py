@@ -0,0 +1,54 @@
+import zlib
+
+import cv2 as cv
+import numpy as np
+
+from enums.codec import Codec
+
+
+CODEC_NAMES = {
+    Codec.Raw: 'Raw',
+    Codec.Zlib: 'Zlib',
+    Codec.JPEG: 'JPEG',
+    Codec.PNG: 'PNG',
+}
+
+SUPPORTED_CODECS = tuple(CODEC_NAMES.keys())
+
+JPEG_QUALITY = 80
+ZLIB_LEVEL = 1
+
+
+def negotiate_codec(requested: int) -> int:
+    # Fall back to the raw buffer when the peer asks for a codec we cannot produce.
+    if requested in SUPPORTED_CODECS:
+        return requested
+    return Codec.Raw
+
+
+def encode_frame(image: np.ndarray, codec: int) -> bytes:
+    if codec == Codec.Raw:
+        return image.tobytes()
+    elif codec == Codec.Zlib:
+        return zlib.compress(image.tobytes(), ZLIB_LEVEL)
+    elif codec == Codec.JPEG:
+        ok, buffer = cv.imencode('.jpg', image, [cv.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    elif codec == Codec.PNG:
+        ok, buffer = cv.imencode('.png', image, [cv.IMWRITE_PNG_COMPRESSION, 1])
+    else:
+        raise ValueError(f'Unknown codec: {codec}')
+
+    if not ok:
+        raise ValueError(f'Failed to encode frame with {CODEC_NAMES[codec]}')
+    return buffer.tobytes()
+
+
+def decode_frame(data: bytes, codec: int, shape: tuple) -> np.ndarray:
+    if codec == Codec.Raw:
+        return np.frombuffer(data, dtype=np.uint8).reshape(shape)
+    elif codec == Codec.Zlib:
+        return np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(shape)
+    elif codec in (Codec.JPEG, Codec.PNG):
+        return cv.imdecode(np.frombuffer(data, dtype=np.uint8), cv.IMREAD_COLOR)
+    else:
+        raise ValueError(f'Unknown codec: {codec}')
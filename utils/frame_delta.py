@@ -0,0 +1,184 @@
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+import experimentservice_pb2 as pb
+
+from utils.frame_codec import encode_frame, decode_frame
+from utils.metrics import ENCODE_SECONDS, DECODE_SECONDS
+
+
+TILE_SIZE = 40
+KEYFRAME_INTERVAL = 60
+MAX_PENDING_FRAMES = 16
+
+# A delta covering more than this share of the screen is sent as a keyframe instead.
+MAX_DELTA_AREA = 0.5
+
+
+class DeltaEncoder:
+    """Encodes frames as tile deltas against the latest frame the server acknowledged.
+
+    acknowledge() is called with the frame ids the server acks, which may be on another thread than
+    encode(). A frame that is never acked is never a base, so a lost frame costs no more than itself.
+    """
+
+    def __init__(self, tile_size: int = TILE_SIZE, keyframe_interval: int = KEYFRAME_INTERVAL):
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+
+        self._next_frame_id = 1
+        self._pending = OrderedDict()
+        self._reference = None
+        self._reference_id = 0
+        self._frames_since_keyframe = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        # Forces the next frame to be a keyframe, e.g. after reconnecting.
+        with self._lock:
+            self._pending.clear()
+            self._reference = None
+            self._reference_id = 0
+
+    def acknowledge(self, frame_id: int):
+        with self._lock:
+            if frame_id not in self._pending:
+                return
+
+            self._reference = self._pending[frame_id]
+            self._reference_id = frame_id
+            for pending_id in list(self._pending.keys()):
+                if pending_id > frame_id:
+                    break
+                del self._pending[pending_id]
+
+    @ENCODE_SECONDS.time()
+    def encode(self, image: np.ndarray, codec: int, frame_id: int = None) -> pb.GameSync:
+        if frame_id is None:
+            frame_id = self._next_frame_id
+        self._next_frame_id = frame_id + 1
+
+        gs = pb.GameSync()
+        gs.frame_id = frame_id
+        gs.codec = codec
+        gs.height, gs.width = image.shape[:2]
+
+        with self._lock:
+            reference, reference_id = self._reference, self._reference_id
+
+        rects = None
+        if reference is not None and reference.shape == image.shape \
+                and self._frames_since_keyframe < self.keyframe_interval:
+            rects = self._changed_rects(image, reference)
+            if sum(w * h for _, _, w, h in rects) > MAX_DELTA_AREA * image.shape[0] * image.shape[1]:
+                rects = None
+
+        if rects is None:
+            gs.keyframe = True
+            gs.screen = encode_frame(image, codec)
+            self._frames_since_keyframe = 0
+        else:
+            gs.base_frame_id = reference_id
+            for x, y, w, h in rects:
+                tile = gs.tiles.add()
+                tile.x, tile.y, tile.width, tile.height = x, y, w, h
+                tile.data = encode_frame(np.ascontiguousarray(image[y:y + h, x:x + w]), codec)
+            self._frames_since_keyframe += 1
+
+        image = image.copy()
+        with self._lock:
+            self._pending[frame_id] = image
+            while len(self._pending) > MAX_PENDING_FRAMES:
+                self._pending.popitem(last=False)
+
+        return gs
+
+    def _changed_rects(self, image: np.ndarray, reference: np.ndarray) -> list:
+        height, width = image.shape[:2]
+        size = self.tile_size
+        rows, cols = -(-height // size), -(-width // size)
+
+        changed = np.zeros((rows * size, cols * size), dtype=bool)
+        changed[:height, :width] = np.any(image != reference, axis=2)
+        changed = changed.reshape(rows, size, cols, size).any(axis=(1, 3))
+
+        # Merge horizontal runs of changed tiles into a single rectangle.
+        rects = []
+        for row in range(rows):
+            col = 0
+            while col < cols:
+                if not changed[row, col]:
+                    col += 1
+                    continue
+                start = col
+                while col < cols and changed[row, col]:
+                    col += 1
+                x, y = start * size, row * size
+                rects.append((x, y, min(col * size, width) - x, min(y + size, height) - y))
+        return rects
+
+
+class DeltaDecoder:
+    """Applies keyframes and tile deltas to a screen buffer in place.
+
+    A delta's base is the last frame the client saw acked, which may be a few frames behind the screen.
+    So every applied frame is kept until a delta names a later base; the encoder never goes back to an
+    older one.
+    """
+
+    def __init__(self, screen: np.ndarray):
+        self.screen = screen
+        self.frame_id = 0
+        self._history = OrderedDict()
+        self._spare = []
+
+    def reset(self):
+        self.frame_id = 0
+        for copy in self._history.values():
+            self._release(copy)
+        self._history.clear()
+
+    def _release(self, copy: np.ndarray):
+        # A couple of copies no longer needed are reused, so keeping a frame usually allocates nothing.
+        if len(self._spare) < 2:
+            self._spare.append(copy)
+
+    def _keep(self, frame_id: int):
+        while len(self._history) >= MAX_PENDING_FRAMES:
+            self._release(self._history.popitem(last=False)[1])
+        copy = self._spare.pop() if self._spare else None
+        if copy is None or copy.shape != self.screen.shape:
+            copy = np.empty_like(self.screen)
+        np.copyto(copy, self.screen)
+        self._history[frame_id] = copy
+
+    @DECODE_SECONDS.time()
+    def apply(self, data: pb.GameSync) -> bool:
+        shape = (data.height or self.screen.shape[0], data.width or self.screen.shape[1], 3)
+
+        if data.keyframe or data.screen:
+            image = decode_frame(data.screen, data.codec, shape)
+            if self.screen.shape != image.shape:
+                self.screen = np.zeros(image.shape, dtype=np.uint8)
+                self.reset()
+            np.copyto(self.screen, image)
+        elif data.base_frame_id not in self._history:
+            # The delta was computed against a frame we never received; wait for a keyframe.
+            return False
+        else:
+            for frame_id in list(self._history):
+                if frame_id >= data.base_frame_id:
+                    break
+                self._release(self._history.pop(frame_id))
+
+            if data.base_frame_id != self.frame_id:
+                np.copyto(self.screen, self._history[data.base_frame_id])
+            for tile in data.tiles:
+                self.screen[tile.y:tile.y + tile.height, tile.x:tile.x + tile.width] = \
+                    decode_frame(tile.data, data.codec, (tile.height, tile.width, 3))
+
+        self.frame_id = data.frame_id
+        self._keep(data.frame_id)
+        return True
@@ -0,0 +1,79 @@
+from collections import namedtuple
+import asyncio
+import threading
+import time
+
+
+DEFAULT_FPS = 30
+
+Frame = namedtuple('Frame', ['frame_id', 'timestamp', 'image', 'action_id'])
+
+
+class FrameProducer(object):
+    """Samples a game wrapper at a target frame rate and publishes only frames it has not seen yet.
+
+    The wrapper must expose `frame_id`, which changes whenever `render()` returns a new image, and
+    `action_id`, the last remote action applied to that image.
+    run() is a coroutine, so sampling shares the event loop with the network streams.
+    """
+
+    def __init__(self, wrapper, fps: int = DEFAULT_FPS):
+        self.wrapper = wrapper
+        self.fps = fps
+
+        self.produced = 0
+        self.skipped = 0
+        self.sent = 0
+
+        self._lock = threading.Lock()
+        self._frame = None
+        self._taken = True
+        self._last_frame_id = None
+
+        self._on_frame = None
+        self._run = False
+
+    def on_frame(self, callback):
+        self._on_frame = callback
+
+    def stop(self):
+        self._run = False
+
+    def take(self):
+        # Returns the newest frame once; None until another new frame is produced.
+        with self._lock:
+            if self._taken:
+                return None
+            self._taken = True
+            self.sent += 1
+            return self._frame
+
+    def stats(self) -> dict:
+        return {'produced': self.produced, 'skipped': self.skipped, 'sent': self.sent}
+
+    async def run(self):
+        self._run = True
+        next_tick = time.perf_counter()
+
+        while self._run:
+            frame_id = self.wrapper.frame_id
+            if frame_id == self._last_frame_id:
+                self.skipped += 1
+            else:
+                self._last_frame_id = frame_id
+                with self._lock:
+                    self._frame = Frame(frame_id, time.time(), self.wrapper.render(), self.wrapper.action_id)
+                    self._taken = False
+                self.produced += 1
+
+                if self._on_frame is not None:
+                    self._on_frame()
+
+            next_tick += 1 / self.fps
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Fell behind; start over from now instead of producing a burst of catch-up frames.
+                next_tick = time.perf_counter()
+                await asyncio.sleep(0)
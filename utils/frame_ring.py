@@ -0,0 +1,124 @@
+from multiprocessing import shared_memory, resource_tracker
+import os
+import struct
+import sys
+
+import numpy as np
+
+from utils.frame_stream import MAX_IN_FLIGHT
+
+
+# A slot is rewritten only after the server acknowledged two newer frames, so the one on display stays intact.
+RING_SLOTS = MAX_IN_FLIGHT + 2
+
+_MAGIC = b'TTFR'
+_HEADER = struct.Struct('<4sIIII')  # magic, slots, height, width, channels
+_HEADER_SIZE = 64
+_SLOT_HEADER_SIZE = 16  # sequence written before and after the pixels
+
+
+def is_local_host(host: str) -> bool:
+    return host in ('localhost', '::1') or host.startswith('127.')
+
+
+def is_local_peer(peer: str) -> bool:
+    # gRPC peers look like 'ipv4:127.0.0.1:50000' or 'ipv6:[::1]:50000'.
+    return peer.startswith('ipv4:127.') or peer.startswith('ipv6:[::1]') or peer.startswith('unix:')
+
+
+class FrameRing(object):
+    """Ring of raw frames in shared memory, written by a client and read by a server on the same host.
+
+    Every slot carries its sequence number before and after the pixels, like a seqlock, so a reader can
+    tell whether a slot was rewritten while it was looking at it. read() returns a view into the ring,
+    not a copy; it is only valid until the writer comes back around to that slot, so a frame that is kept
+    must be copied with read_copy().
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self._shm = shm
+        self._owner = owner
+
+        magic, self.slots, height, width, channels = _HEADER.unpack_from(shm.buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{shm.name} is not a frame ring')
+        self.shape = (height, width, channels)
+
+        frame_size = height * width * channels
+        self._slot_size = -(-(_SLOT_HEADER_SIZE + frame_size) // 64) * 64
+
+        self._sequences = []
+        self._frames = []
+        for slot in range(self.slots):
+            offset = _HEADER_SIZE + slot * self._slot_size
+            self._sequences.append(np.ndarray((2,), dtype=np.uint64, buffer=shm.buf, offset=offset))
+            self._frames.append(np.ndarray(self.shape, dtype=np.uint8, buffer=shm.buf,
+                                           offset=offset + _SLOT_HEADER_SIZE))
+
+        self._sequence = 0
+
+    @classmethod
+    def create(cls, name: str, shape: tuple, slots: int = RING_SLOTS):
+        height, width, channels = shape
+        slot_size = -(-(_SLOT_HEADER_SIZE + height * width * channels) // 64) * 64
+
+        shm = shared_memory.SharedMemory(name=name, create=True, size=_HEADER_SIZE + slots * slot_size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, slots, height, width, channels)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str):
+        # The client owns the segment; if the reader's resource tracker knew it, it would unlink it on exit.
+        if sys.version_info >= (3, 13):
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+            if os.name == 'posix':
+                # Only POSIX segments are tracked, under their name with the leading '/'.
+                resource_tracker.unregister('/' + shm.name, 'shared_memory')
+        return cls(shm, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def write(self, image) -> int:
+        self._sequence += 1
+        slot = self._sequence % self.slots
+        sequences = self._sequences[slot]
+
+        sequences[0] = self._sequence
+        np.copyto(self._frames[slot], image)
+        sequences[1] = self._sequence
+        return self._sequence
+
+    def read(self, sequence: int):
+        # None when the slot no longer (or not yet) holds this frame.
+        if not self.valid(sequence):
+            return None
+        return self._frames[sequence % self.slots]
+
+    def read_copy(self, sequence: int):
+        # A copy that stays intact after the slot is rewritten; None if it was rewritten while being copied.
+        frame = self.read(sequence)
+        if frame is None:
+            return None
+        frame = frame.copy()
+        return frame if self.valid(sequence) else None
+
+    def valid(self, sequence: int) -> bool:
+        if not self._sequences:
+            return False
+        sequences = self._sequences[sequence % self.slots]
+        return sequences[0] == sequence and sequences[1] == sequence
+
+    def close(self):
+        self._sequences = []
+        self._frames = []
+        try:
+            self._shm.close()
+        except BufferError:
+            # A frame on display still views the ring; the mapping goes away with the last view.
+            pass
+        if self._owner:
+            self._shm.unlink()
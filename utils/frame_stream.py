@@ -0,0 +1,109 @@
+from collections import deque
+import asyncio
+import time
+
+
+MAX_IN_FLIGHT = 2
+ACK_TIMEOUT = 1.0
+
+
+class FrameStream(object):
+    """Async request iterator of the GameStream RPC.
+
+    It yields the freshest frame only while fewer than `window` frames are waiting for an ack,
+    so frames rendered while the server lags are dropped instead of queued. Messages passed to send()
+    carry no frame and go out ahead of the next frame, outside the window.
+    """
+
+    def __init__(self, next_frame, window: int = MAX_IN_FLIGHT, ack_timeout: float = ACK_TIMEOUT):
+        self._next_frame = next_frame
+        self.window = window
+        self.ack_timeout = ack_timeout
+
+        self._in_flight = {}
+        self._outbox = deque()
+        self._next_frame_id = 1
+        self._has_new_frame = False
+        self._closed = False
+
+        self._loop = None
+        self._wakeup = None
+
+        self._on_frames_lost = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._wakeup is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+
+        while True:
+            while not self._closed and not self._ready():
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.ack_timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._expire_in_flight()
+            # Messages sent before close() still go out, so a last word reaches the server.
+            if self._outbox:
+                return self._outbox.popleft()
+            if self._closed:
+                raise StopAsyncIteration
+
+            frame_id = self._next_frame_id
+            self._has_new_frame = False
+
+            # Encoding is CPU bound, so it runs off the event loop.
+            game_sync = await self._loop.run_in_executor(None, self._next_frame, frame_id)
+            if game_sync is None:
+                continue
+
+            self._next_frame_id += 1
+            self._in_flight[frame_id] = time.time()
+            return game_sync
+
+    def _ready(self) -> bool:
+        return bool(self._outbox) or (self._has_new_frame and len(self._in_flight) < self.window)
+
+    def _expire_in_flight(self):
+        # Frames the server never acknowledged are lost, so the next frame must not depend on them.
+        deadline = time.time() - self.ack_timeout
+        if any(sent_at < deadline for sent_at in self._in_flight.values()):
+            self._in_flight.clear()
+            if self._on_frames_lost is not None:
+                self._on_frames_lost()
+
+    def _wake(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def on_frames_lost(self, callback):
+        self._on_frames_lost = callback
+
+    def send(self, message):
+        self._outbox.append(message)
+        self._wake()
+
+    def notify_frame(self):
+        self._has_new_frame = True
+        self._wake()
+
+    def acknowledge(self, frame_id: int):
+        for pending_id in [i for i in self._in_flight if i <= frame_id]:
+            del self._in_flight[pending_id]
+        self._wake()
+
+    def close(self):
+        self._closed = True
+        self._wake()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
@@ -0,0 +1,25 @@
+# Liveness is inferred from traffic on the game stream. Keepalive pings only go out while the
+# connection is idle, and a peer that does not answer one in time gets its streams cancelled.
+KEEPALIVE_TIME_MS = 1000
+KEEPALIVE_TIMEOUT_MS = 1000
+
+CHANNEL_OPTIONS = [
+    ('grpc.keepalive_time_ms', KEEPALIVE_TIME_MS),
+    ('grpc.keepalive_timeout_ms', KEEPALIVE_TIMEOUT_MS),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+]
+
+SERVER_OPTIONS = [
+    ('grpc.keepalive_time_ms', KEEPALIVE_TIME_MS),
+    ('grpc.keepalive_timeout_ms', KEEPALIVE_TIMEOUT_MS),
+    ('grpc.keepalive_permit_without_calls', 1),
+    ('grpc.http2.max_pings_without_data', 0),
+    ('grpc.http2.min_ping_interval_without_data_ms', KEEPALIVE_TIME_MS // 2),
+]
+
+# Invocation metadata key under which clients send the token that names their session.
+SESSION_TOKEN_KEY = 'session-token'
+
+# Sent along with the token when a client reconnects: the sequence number of the last command it received.
+RESUME_FROM_KEY = 'resume-from'
@@ -0,0 +1,74 @@
+from collections import deque, namedtuple
+import threading
+import time
+
+from utils.latency import LatencyHistogram
+
+
+# Inputs waiting per player; at 10 ticks/s up to 200 ms of backlog.
+INPUT_BUFFER = 2
+
+# An input that waited longer than this no longer fits the state the player saw when making it.
+MAX_INPUT_AGE = 0.25
+
+STAY = 4
+
+Input = namedtuple('Input', ['action', 'action_id', 'timestamp'])
+
+
+class InputBuffer(object):
+    """Timestamped inputs of each player, consumed one per player per tick.
+
+    put() may be called from any thread. take() returns the oldest waiting input of every player, so
+    inputs are applied in the order they arrived, one tick each. An input put while a player's buffer is
+    full replaces the newest waiting one, since the latest intent wins over a backlog. Inputs that waited
+    longer than max_age are dropped when the tick reaches them.
+    """
+
+    def __init__(self, players: int = 2, size: int = INPUT_BUFFER, max_age: float = MAX_INPUT_AGE):
+        self.size = size
+        self.max_age = max_age
+        self._inputs = [deque() for _ in range(players)]
+        self._lock = threading.Lock()
+
+        self.consumed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.age = LatencyHistogram()
+
+    def put(self, player: int, action: int, action_id: int = 0):
+        entry = Input(action, action_id, time.perf_counter())
+        with self._lock:
+            inputs = self._inputs[player]
+            if len(inputs) == self.size:
+                inputs[-1] = entry
+                self.coalesced += 1
+            else:
+                inputs.append(entry)
+
+    def take(self) -> list:
+        # One Input per player, None where nothing is waiting.
+        now = time.perf_counter()
+        taken = []
+        with self._lock:
+            for inputs in self._inputs:
+                while inputs and now - inputs[0].timestamp > self.max_age:
+                    inputs.popleft()
+                    self.dropped += 1
+
+                entry = inputs.popleft() if inputs else None
+                if entry is not None:
+                    self.consumed += 1
+                    self.age.add((now - entry.timestamp) * 1000)
+                taken.append(entry)
+        return taken
+
+    def clear(self):
+        with self._lock:
+            for inputs in self._inputs:
+                inputs.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'consumed': self.consumed, 'coalesced': self.coalesced, 'dropped': self.dropped,
+                    'age': self.age.percentiles()}
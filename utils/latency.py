@@ -0,0 +1,145 @@
+from collections import deque, OrderedDict
+import threading
+import time
+
+import numpy as np
+
+from enums.commands import Command
+from utils.metrics import LATENCY_SECONDS
+
+
+HISTOGRAM_WINDOW = 1000
+CLOCK_SAMPLES = 32
+MAX_PENDING_ACTIONS = 256
+
+METRICS = ('command', 'frame', 'key_to_frame', 'bot_drift', 'bot_inference')
+
+_EXPORTED = {name: LATENCY_SECONDS.labels(name) for name in METRICS}
+
+
+class LatencyHistogram(object):
+    """Rolling window of latency samples in milliseconds."""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        self._samples = deque(maxlen=window)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, ms: float):
+        self._samples.append(ms)
+
+    def samples(self) -> list:
+        return list(self._samples)
+
+    def percentiles(self) -> dict:
+        if not self._samples:
+            return {'count': 0}
+
+        p50, p95, p99 = np.percentile(self._samples, (50, 95, 99))
+        return {'count': len(self._samples), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+
+class ClockOffset(object):
+    """NTP-style estimate of how far the client clock runs ahead of the server clock.
+
+    Each sample is a round trip: server sends at t0, client receives at t1 and replies at t2, server
+    receives at t3. The sample with the shortest round trip among the recent ones has the least queueing
+    in it, so its offset is used.
+    """
+
+    def __init__(self, window: int = CLOCK_SAMPLES):
+        self._samples = deque(maxlen=window)
+        self.offset = None
+        self.rtt = None
+
+    def add(self, t0: float, t1: float, t2: float, t3: float):
+        rtt = (t3 - t0) - (t2 - t1)
+        if rtt < 0:
+            return
+        self._samples.append((rtt, ((t1 - t0) + (t2 - t3)) / 2))
+        self.rtt, self.offset = min(self._samples)
+
+    def to_server_time(self, client_time: float) -> float:
+        return client_time - (self.offset or 0.0)
+
+
+class LatencyTracker(object):
+    """Per-session latency bookkeeping on the server.
+
+    Commands are stamped with the server time when they are queued, and key inputs are numbered. The
+    client echoes the last command it saw and the last key input applied to the frame it sends. From that
+    the tracker derives command delivery, frame delivery (capture to arrival) and key-to-frame latency.
+    Other server-side timings, like how late bot decisions fire, are added with record().
+    """
+
+    def __init__(self):
+        self.clock = ClockOffset()
+        self.histograms = OrderedDict((name, LatencyHistogram()) for name in METRICS)
+
+        self._lock = threading.Lock()
+        self._next_action_id = 1
+        self._pending_actions = OrderedDict()
+        self._last_echo = 0.0
+
+    def command_sent(self, state):
+        with self._lock:
+            state.timestamp = time.time()
+            if state.command == Command.KeyInput:
+                state.key_input.sequence = self._next_action_id
+                self._next_action_id += 1
+
+                self._pending_actions[state.key_input.sequence] = state.timestamp
+                if len(self._pending_actions) > MAX_PENDING_ACTIONS:
+                    self._pending_actions.popitem(last=False)
+
+    def frame_received(self, game_sync, received_at: float):
+        with self._lock:
+            if game_sync.echo_timestamp > self._last_echo and game_sync.sent_timestamp:
+                self._last_echo = game_sync.echo_timestamp
+                self.clock.add(game_sync.echo_timestamp, game_sync.echo_received,
+                               game_sync.sent_timestamp, received_at)
+                self._record('command', self.clock.to_server_time(game_sync.echo_received) - game_sync.echo_timestamp)
+
+            if game_sync.timestamp and self.clock.offset is not None:
+                self._record('frame', received_at - self.clock.to_server_time(game_sync.timestamp))
+
+            # Every key input up to the echoed id has made it into a frame by now. Ids this session never
+            # issued come from an earlier session of the same client and are ignored.
+            while self._pending_actions and game_sync.action_id < self._next_action_id:
+                action_id, sent_at = next(iter(self._pending_actions.items()))
+                if action_id > game_sync.action_id:
+                    break
+                del self._pending_actions[action_id]
+                self._record('key_to_frame', received_at - sent_at)
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            self._record(name, seconds)
+
+    def _record(self, name: str, seconds: float):
+        self.histograms[name].add(seconds * 1000)
+        _EXPORTED[name].observe(seconds)
+
+    def snapshot(self, samples: bool = False) -> dict:
+        with self._lock:
+            result = {
+                'clock_offset_ms': None if self.clock.offset is None else self.clock.offset * 1000,
+                'rtt_ms': None if self.clock.rtt is None else self.clock.rtt * 1000,
+            }
+            for name, histogram in self.histograms.items():
+                result[name] = histogram.percentiles()
+                if samples:
+                    result[name]['samples'] = histogram.samples()
+            return result
+
+    def summary(self) -> str:
+        snapshot = self.snapshot()
+        parts = []
+        for name in METRICS:
+            stats = snapshot[name]
+            if stats['count']:
+                parts.append(f'{name} p50/p95/p99 {stats["p50"]:.1f}/{stats["p95"]:.1f}/{stats["p99"]:.1f} ms')
+        if snapshot['clock_offset_ms'] is not None:
+            parts.append(f'offset {snapshot["clock_offset_ms"]:.1f} ms')
+        return ', '.join(parts)
@@ -0,0 +1,92 @@
+import threading
+import time
+
+from overcooked_ai_py.env import OverCookedEnv
+
+from utils.input_buffer import InputBuffer, STAY
+from utils.metrics import ENV_STEP_SECONDS
+
+
+# Game steps per second in every sync mode, so a game runs at the same pace wherever it is simulated.
+DEFAULT_TICK_RATE = 10
+
+
+class LockstepSimulation(object):
+    """Server-authoritative game of one session, stepped at a fixed tick rate.
+
+    Players only submit inputs. Every tick applies the next buffered input of each player, or stays, and
+    publishes the resulting state, so human and bot partners act on the same tick boundaries. Inputs wait
+    in the same InputBuffer as in the client's own game loop.
+    Player 0 is the participant's client and player 1 the partner on the server.
+    """
+
+    def __init__(self, level: str, duration: int, tick_rate: int = DEFAULT_TICK_RATE):
+        self.level = level
+        self.tick_rate = tick_rate
+        self.env = OverCookedEnv(scenario=level, time_limit=duration)
+
+        self.tick = 0
+        self.late_ticks = 0
+
+        self.inputs = InputBuffer(players=2)
+
+        self._on_tick = None
+        self._on_finished = None
+        self._run = False
+
+    def on_tick(self, callback):
+        # Called with (tick, game_state) from the simulation thread after every step.
+        self._on_tick = callback
+
+    def on_finished(self, callback):
+        self._on_finished = callback
+
+    def submit(self, player: int, action: int):
+        self.inputs.put(player, action)
+
+    def start(self):
+        self.env.reset()
+        self._run = True
+
+        t1 = threading.Thread(target=self._loop, daemon=True)
+        t1.start()
+
+    def stop(self):
+        self._run = False
+
+    def _step(self) -> dict:
+        action = [STAY if entry is None else entry.action for entry in self.inputs.take()]
+
+        with ENV_STEP_SECONDS.time():
+            self.env.step(action=action)
+        self.tick += 1
+
+        game_state = self.env.get_state()
+        game_state['level'] = self.level
+        return game_state
+
+    def stats(self) -> dict:
+        return {'ticks': self.tick, 'late': self.late_ticks, 'inputs': self.inputs.stats()}
+
+    def _loop(self):
+        next_tick = time.perf_counter()
+
+        while self._run:
+            game_state = self._step()
+            if self._on_tick is not None:
+                self._on_tick(self.tick, game_state)
+
+            if game_state['time_left'] <= 0:
+                self._run = False
+                if self._on_finished is not None:
+                    self._on_finished()
+                return
+
+            next_tick += 1 / self.tick_rate
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # A tick overran; keep the rate from here rather than stepping in a burst.
+                self.late_ticks += 1
+                next_tick = time.perf_counter()
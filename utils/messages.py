@@ -0,0 +1,24 @@
+import json
+
+import experimentservice_pb2 as pb
+
+
+CONFIG_FIELDS = ('level', 'duration', 'player', 'bot_apm', 'codec', 'sync_mode', 'frame_transport', 'fps',
+                 'tick_rate')
+
+
+def config_message(config: dict) -> pb.Config:
+    return pb.Config(**{name: config[name] for name in CONFIG_FIELDS if name in config})
+
+
+def config_from_message(config: pb.Config) -> dict:
+    return {name: getattr(config, name) for name in CONFIG_FIELDS}
+
+
+def fill_game_state(message: pb.GameState, game_state: dict):
+    # Only the Overcooked state itself stays JSON; it is nested too deeply to be worth a schema.
+    message.level = game_state['level']
+    message.timestep = game_state['state']['timestep']
+    message.time_left = game_state['time_left']
+    message.score = game_state['score']
+    message.state = json.dumps(game_state['state'], separators=(',', ':'))
@@ -0,0 +1,53 @@
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from enums.commands import Command
+
+
+SERVER_METRICS_PORT = 9912
+CLIENT_METRICS_PORT = 9913
+
+# Seconds, from sub-millisecond codec work up to a slow bot decision or a frame stuck behind a full window.
+TIME_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5)
+
+COMMAND_NAMES = {value: name for name, value in vars(Command).items() if not name.startswith('_')}
+
+FRAMES = Counter('turingtest_frames', 'Game syncs sent or received on the game stream', ['direction'])
+BYTES = Counter('turingtest_bytes', 'Serialized message bytes sent or received on the game stream', ['direction'])
+COMMANDS = Counter('turingtest_commands', 'Commands sent or received', ['direction', 'command'])
+FRAME_CODEC_SECONDS = Histogram('turingtest_frame_codec_seconds', 'Time to delta encode or decode one frame',
+                                ['operation'], buckets=TIME_BUCKETS)
+LATENCY_SECONDS = Histogram('turingtest_latency_seconds', 'Latencies of all sessions, as in the latency log',
+                            ['metric'], buckets=TIME_BUCKETS)
+ENV_STEP_SECONDS = Histogram('turingtest_env_step_seconds', 'Time of one Overcooked env step', buckets=TIME_BUCKETS)
+RENDER_SECONDS = Histogram('turingtest_render_seconds', 'Time to render one game image', buckets=TIME_BUCKETS)
+QUEUE_WAIT_SECONDS = Histogram('turingtest_command_queue_wait_seconds', 'Time commands wait in a session queue',
+                               ['lane'], buckets=TIME_BUCKETS)
+SESSIONS = Gauge('turingtest_sessions', 'Sessions held by the server, detached ones included')
+SPECTATORS = Gauge('turingtest_spectators', 'Spectator streams open on the server')
+
+# Children bound up front, so the per-frame paths skip the label lookup.
+FRAMES_SENT = FRAMES.labels('sent')
+FRAMES_RECEIVED = FRAMES.labels('received')
+BYTES_SENT = BYTES.labels('sent')
+BYTES_RECEIVED = BYTES.labels('received')
+ENCODE_SECONDS = FRAME_CODEC_SECONDS.labels('encode')
+DECODE_SECONDS = FRAME_CODEC_SECONDS.labels('decode')
+
+_commands = {}
+
+
+def count_command(direction: str, command: int):
+    key = (direction, command)
+    counter = _commands.get(key)
+    if counter is None:
+        counter = _commands[key] = COMMANDS.labels(direction, COMMAND_NAMES.get(command, str(command)))
+    counter.inc()
+
+
+def start_exporter(port: int) -> bool:
+    # Served on localhost only; False when another process on this host already has the port.
+    try:
+        start_http_server(port, addr='127.0.0.1')
+    except OSError:
+        return False
+    return True
@@ -5,13 +5,29 @@ import pygame as pg
 import numpy as np
 import threading
 
+from overcooked_ai_py.env import OverCookedRenderer
+
+from utils.display import Display, DISPLAY_FPS
+from utils.metrics import RENDER_SECONDS
+
 
 class DummyWrapper:
-    def __init__(self):
+    def __init__(self, headless: bool = False):
         self.level = None
         self.duration = None
 
+        # Headless, there is no window to draw in or take key presses from, so no loop runs at all.
+        self.headless = headless
+
         self._rendered_image = None
+        self._renderer = None
+
+        # States are rendered into these two in turn, so the display loop can still upload the last one.
+        self._frames = [np.empty((600, 800, 3), dtype=np.uint8) for _ in range(2)]
+        self._next_frame = 0
+
+        # Bumped on every new image, including ones patched into the same array, so the loop knows to upload.
+        self._image_version = 0
 
         self._on_action_event = None
         self._on_close_event = None
@@ -21,19 +37,27 @@ class DummyWrapper:
         self.start_game()
 
     def _init_gui(self):
-        pg.display.set_caption('Player 2')
-        self.screen = pg.display.set_mode((800, 600))
-
-        self._run = True
-        self.thr_game = threading.Thread(target=self._loop, args=(self, ))
-        self.thr_game.start()
+        # The display loop is started by start_game(); a second one would race it for the same surface.
+        self.display = None if self.headless else Display('Player 2')
 
 
     def set_image(self, image):
         self._rendered_image = image
+        self._image_version += 1
+
+    @RENDER_SECONDS.time()
+    def set_state(self, level: str, state, time_left: float, score: float):
+        if self.headless:
+            return
+        if self._renderer is None or self._renderer.scenario != level:
+            self._renderer = OverCookedRenderer(scenario=level)
+
+        buffer = self._frames[self._next_frame]
+        self._next_frame ^= 1
+        self.set_image(self._renderer.render(state, time_left, score, size=(800, 600), out=buffer))
 
     def _reset_image(self):
-        self._rendered_image = np.zeros((600, 800, 3), dtype=np.uint8)
+        self.set_image(np.zeros((600, 800, 3), dtype=np.uint8))
 
     def on_action(self, callback):
         self._on_action_event = callback
@@ -58,12 +82,16 @@ class DummyWrapper:
         pass
 
     def start_game(self):
+        if self.headless:
+            return
         self._run = True
 
         t1 = threading.Thread(target=self._loop, args=(self, ))
         t1.start()
 
     def _loop(self, parent_instance):
+        clock = pg.time.Clock()
+        shown_version = None
 
         while parent_instance._run:
 
@@ -88,9 +116,11 @@ class DummyWrapper:
             if action != 4:
                 parent_instance._on_player_action(action)
 
-            image = parent_instance._rendered_image
-            self.screen.blit(pg.surfarray.make_surface(np.rot90(np.flip(image[..., ::-1], 1))), (0, 0))
-            pg.display.flip()
+            # Taken before the image: an image set meanwhile is then uploaded on the next pass, not skipped.
+            version = parent_instance._image_version
+            self.display.show(parent_instance._rendered_image, changed=version != shown_version)
+            shown_version = version
+            clock.tick(DISPLAY_FPS)
 
     def render(self):
         return self._rendered_image
@@ -1,39 +1,113 @@
 import pygame as pg
 import numpy as np
 import threading
-import cv2 as cv
 import time
 
-from overcooked_ai_py.env import OverCookedEnv
+from overcooked_ai_py.env import OverCookedEnv, OverCookedRenderer
+
+from utils.display import Display, DISPLAY_FPS
+from utils.input_buffer import InputBuffer, STAY
+from utils.latency import LatencyHistogram
+from utils.lockstep import DEFAULT_TICK_RATE
+from utils.metrics import ENV_STEP_SECONDS, RENDER_SECONDS
+
+# The local game steps at a fixed rate whatever the machine, since cooking and movement count in steps;
+# the rate is the one lockstep games run at on the server.
+RENDER_FPS = 30
+
+# Ticks run back to back to catch up after a stall; time beyond this many is let go instead.
+MAX_CATCHUP_TICKS = 5
+
+KEY_ACTIONS = {pg.K_UP: 0, pg.K_DOWN: 1, pg.K_RIGHT: 2, pg.K_LEFT: 3, pg.K_RSHIFT: 5}
+
+LOCAL_PLAYER = 0
+REMOTE_PLAYER = 1
 
 
 class GymWrapper:
-    def __init__(self):
+    def __init__(self, tick_rate: int = DEFAULT_TICK_RATE, render_fps: int = RENDER_FPS, headless: bool = False):
         self.level = None
         self.duration = None
 
+        # Headless, there is no window: frames are only rendered for render(), and there are no key presses.
+        self.headless = headless
+
+        self.tick_rate = tick_rate
+        self.render_fps = render_fps
+        self._last_loop = None
+        self._accumulator = 0.0
+        self._next_render = 0.0
+        self._ticks_rendered = 0
+
+        # Key presses and remote actions wait here for the tick that applies them.
+        self.inputs = InputBuffer()
+
+        # How late each tick ran after it was due, and how often the loop fell a tick or more behind.
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped_ticks = 0
+        self.renders = 0
+        self.jitter = LatencyHistogram()
+        self._stats_lock = threading.Lock()
+
         self._rendered_image = None
-        self._remote_action = None
+        self.frame_id = 0
+        self._shown_frame_id = None
+        self.action_id = 0
+        self._applied_action_id = 0
         self._black_screen = np.zeros((600, 800, 3), dtype=np.uint8)
 
-        self._reset_image()
-        self._init_gui()
-        self.start_game()
+        # Renders go into these two in turn: the frame producer and the display may still read the last
+        # frame while the next one is drawn.
+        self._frames = [np.empty((600, 800, 3), dtype=np.uint8) for _ in range(2)]
+        self._next_frame = 0
+
+        # In lockstep the server owns the game; this wrapper only forwards keys and draws received states.
+        self.lockstep = False
+        self._pending_state = None
+        self._renderer = None
+        self._on_key_input = None
 
+        # start_game() only asks for a game; the game thread builds the env, so no caller waits on it.
         self._start_time = None
+        self._start_requested = False
+        self._game_lock = threading.Lock()
         self.env = None
 
+        self._reset_image()
+        self._init_gui()
+        self.start_game()
+
     def _init_gui(self):
-        pg.display.set_caption('Player 1')
-        self.screen = pg.display.set_mode((800, 600))
+        self.display = None if self.headless else Display('Player 1')
 
         self._run = True
         self.thr_game = threading.Thread(target=self._loop, args=(self, ))
         self.thr_game.start()
 
 
+    def _show(self):
+        # Only a frame not shown yet is uploaded; other passes just flip. The id is read first, so the image
+        # is never older than the id recorded for it.
+        if self.display is not None:
+            frame_id = self.frame_id
+            self.display.show(self._rendered_image, changed=frame_id != self._shown_frame_id)
+            self._shown_frame_id = frame_id
+
+    def _frame_buffer(self):
+        buffer = self._frames[self._next_frame]
+        self._next_frame ^= 1
+        return buffer
+
     def _reset_image(self):
-        self._rendered_image = self._black_screen
+        self._set_image(self._black_screen)
+
+    def _set_image(self, image):
+        # frame_id tells frame consumers whether render() has anything new since they last looked.
+        if image is not self._rendered_image:
+            self._rendered_image = image
+            self.action_id = self._applied_action_id
+            self.frame_id += 1
 
     def set_level(self, level: str) -> None:
         self.level = level
@@ -41,8 +115,30 @@ class GymWrapper:
     def set_duration(self, duration: int) -> None:
         self.duration = duration
 
-    def remote_action(self, action: int):
-        self._remote_action = action
+    def set_tick_rate(self, tick_rate: int) -> None:
+        self.tick_rate = tick_rate
+
+    def set_lockstep(self, enabled: bool) -> None:
+        if enabled and not self.lockstep and (self.env is not None or self._start_requested):
+            self.abort_game()
+        self.lockstep = enabled
+        self._pending_state = None
+
+    def on_key_input(self, callback):
+        self._on_key_input = callback
+
+    def set_state(self, level: str, state, time_left: float, score: float):
+        # Rendered on the game thread, so callers on the network loop return right away.
+        self._pending_state = (level, state, time_left, score)
+
+    @RENDER_SECONDS.time()
+    def _render_state(self, level: str, state, time_left: float, score: float):
+        if self._renderer is None or self._renderer.scenario != level:
+            self._renderer = OverCookedRenderer(scenario=level)
+        return self._renderer.render(state, time_left, score, size=(800, 600), out=self._frame_buffer())
+
+    def remote_action(self, action: int, action_id: int = 0):
+        self.inputs.put(REMOTE_PLAYER, action, action_id)
 
     def on_key_pressed(self, key: int) -> None:
         self._key_id = key
@@ -72,60 +168,164 @@ class GymWrapper:
         pass
 
     def start_game(self):
+        if self.lockstep:
+            self._reset_image()
+            return
+
+        with self._game_lock:
+            self._start_requested = True
+        self.inputs.clear()
+
+    def _start_env(self):
+        with self._game_lock:
+            if not self._start_requested:
+                return
+            level, duration = self.level, self.duration
+
         try:
-            self.env = OverCookedEnv(scenario=self.level, time_limit=self.duration)
-            self.env.reset()
-            self._start_time = time.time()
+            env = OverCookedEnv(scenario=level, time_limit=duration)
+            env.reset()
         except:
-            pass
+            env = None
+
+        with self._game_lock:
+            # An abort while the env was being built cancels the game it was meant for.
+            if not self._start_requested:
+                return
+            self._start_requested = False
+            if env is None:
+                return
+
+            self._start_time = time.time()
+            self._last_loop = None
+            self._accumulator = 0.0
+            self.env = env
 
     def abort_game(self):
-        del self.env
+        # Safe to repeat: a game may already be over by the time the server's abort arrives.
+        with self._game_lock:
+            self._start_requested = False
+            self.env = None
+        self._pending_state = None
         self._reset_image()
 
     def _loop(self, parent_instance):
+        clock = pg.time.Clock()
 
         while parent_instance._run:
-            action = [4, 4]
+            # Every key pressed since the last loop counts, not just the last one.
+            keys = []
 
-            for event in pg.event.get():
+            for event in pg.event.get() if self.display is not None else ():
                 if event.type == pg.QUIT:
                     parent_instance._on_close()
 
-                if event.type == pg.KEYDOWN:
-                    if event.key == pg.K_UP:  # up
-                        action[0] = 0
-                    if event.key == pg.K_DOWN:  # down
-                        action[0] = 1
-                    if event.key == pg.K_LEFT:  # left
-                        action[0] = 3
-                    if event.key == pg.K_RIGHT:  # right
-                        action[0] = 2
-                    if event.key == pg.K_RSHIFT:  # pickup
-                        action[0] = 5
+                if event.type == pg.KEYDOWN and event.key in KEY_ACTIONS:
+                    keys.append(KEY_ACTIONS[event.key])
+
+            if not parent_instance.lockstep:
+                self._start_env()
+
+            if parent_instance.lockstep:
+                if parent_instance._on_key_input is not None:
+                    for key in keys:
+                        parent_instance._on_key_input(key)
+
+                pending, parent_instance._pending_state = parent_instance._pending_state, None
+                if pending is not None:
+                    parent_instance._set_image(parent_instance._render_state(*pending))
 
-            if hasattr(self, 'env') and self.env is not None:
-                if self._remote_action != None:
-                    action[1] = self._remote_action
-                    self._remote_action = None
+                self._show()
+                clock.tick(DISPLAY_FPS)
 
-                self.env.step(action=action)
-                image = self.env.render()
-                image = cv.resize(image, (800, 600))
+            elif self.env is not None:
+                # abort_game() may drop the env from another thread; this pass finishes with the one it started on.
+                env = self.env
+                for key in keys:
+                    self.inputs.put(LOCAL_PLAYER, key)
 
-                self.screen.blit(pg.surfarray.make_surface(np.rot90(np.flip(image[..., ::-1], 1))), (0, 0))
-                pg.display.flip()
+                self._advance(env)
+                if self.ticks != self._ticks_rendered and time.perf_counter() >= self._next_render:
+                    self._ticks_rendered = self.ticks
+                    self._next_render = time.perf_counter() + 1 / self.render_fps
+                    self.renders += 1
 
-                parent_instance._rendered_image = image
+                    with RENDER_SECONDS.time():
+                        image = env.render(size=(800, 600), out=self._frame_buffer())
+
+                    parent_instance._set_image(image)
+                    self._show()
 
                 if time.time() - self._start_time > self.duration:
                     self.abort_game()
+                else:
+                    self._wait()
 
             else:
-                self.screen.blit(pg.surfarray.make_surface(np.rot90(self._black_screen)), (0, 0))
-                pg.display.flip()
-
-                parent_instance._rendered_image = self._black_screen
+                parent_instance._set_image(self._black_screen)
+                self._show()
+                clock.tick(DISPLAY_FPS)
+
+    def _advance(self, env):
+        # Fixed timestep: the time since the last loop is banked and spent in whole ticks.
+        now = time.perf_counter()
+        if self._last_loop is None:
+            self._last_loop = now - 1 / self.tick_rate
+        self._accumulator += now - self._last_loop
+        self._last_loop = now
+
+        period = 1 / self.tick_rate
+        steps = 0
+        while self._accumulator >= period:
+            if steps == MAX_CATCHUP_TICKS:
+                # Too far behind to catch up without the game visibly racing; the rest is let go.
+                with self._stats_lock:
+                    self.skipped_ticks += int(self._accumulator / period)
+                self._accumulator %= period
+                break
+
+            with self._stats_lock:
+                self.jitter.add((self._accumulator - period) * 1000)
+            self._tick(env)
+            self._accumulator -= period
+            steps += 1
+
+        if steps > 1:
+            with self._stats_lock:
+                self.overruns += 1
+
+    def _tick(self, env):
+        local, remote = self.inputs.take()
+        action = [STAY if local is None else local.action, STAY if remote is None else remote.action]
+        if remote is not None:
+            self._applied_action_id = remote.action_id
+
+        with ENV_STEP_SECONDS.time():
+            env.step(action=action)
+        self.ticks += 1
+
+    def _wait(self):
+        # Sleep until the next tick, or until a tick that was not drawn yet may be rendered.
+        due = self._last_loop + 1 / self.tick_rate - self._accumulator
+        if self.ticks != self._ticks_rendered:
+            due = min(due, self._next_render)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {'ticks': self.ticks, 'overruns': self.overruns, 'skipped': self.skipped_ticks,
+                    'renders': self.renders, 'jitter': self.jitter.percentiles(), 'inputs': self.inputs.stats()}
 
     def render(self):
         return self._rendered_image
+
+    def get_game_state(self):
+        env = self.env
+        if env is None:
+            return None
+
+        game_state = env.get_state()
+        game_state['level'] = self.level
+        return game_state